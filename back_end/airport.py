@@ -1,8 +1,82 @@
-from db import get_connection
-from geopy import distance
-from itertools import combinations, permutations
+from db import connection
+from distances import DistanceMatrix, point_distance
+from spatial import SpatialGrid
+from route_solver import solve_routes_batch
+from route_executor import route_executor
+from cache import LRUCache
+from instrumentation import record_distance, timed
+from array import array
+from bisect import bisect_left
+import hashlib
+import os
+import sys
+import threading
+import time
+import numpy as np
 
+# === Columnar airport data: one tuple/array per field instead of one object per row ===
+# names=None and cities=None with load_details: both are loaded by load_details() on first access.
+class AirportStore:
+    def __init__(self, idents, names, lats, lngs, cities, countries, load_details=None):
+        self.idents = tuple(sys.intern(ident) for ident in idents)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.countries = tuple(sys.intern(country) for country in countries)
+        self._names = None
+        self._cities = None
+        self._load_details = load_details
+        self._details_lock = threading.Lock()
+        if names is not None:
+            self._set_details(names, cities)
+
+    def _set_details(self, names, cities):
+        self._names = tuple(names)
+        self._cities = tuple(sys.intern(city) for city in cities)
+
+    @property
+    def details_loaded(self):
+        return self._names is not None
+
+    # === (names, cities) in ident order, from load_details(idents) the first time ===
+    def details(self):
+        if self._names is None:
+            with self._details_lock:
+                if self._names is None:
+                    self._set_details(*self._load_details(self.idents))
+        return self._names, self._cities
+
+    @property
+    def names(self):
+        return self.details()[0]
+
+    @property
+    def cities(self):
+        return self.details()[1]
+
+    @classmethod
+    def from_airports(cls, airports):
+        airports = list(airports)
+        return cls(
+            [a.ident for a in airports],
+            [a.name for a in airports],
+            [a.lat for a in airports],
+            [a.lng for a in airports],
+            [a.city for a in airports],
+            [a.country for a in airports]
+        )
+
+    def __len__(self):
+        return len(self.idents)
+
+    # === Lightweight Airport view of row i ===
+    def airport(self, i):
+        return AirportView(self, i)
+
+
+# === Standalone airport record (airports outside the catalog, tests, scripts) ===
 class Airport:
+    __slots__ = ("ident", "name", "lat", "lng", "city", "country")
+
     def __init__(self, ident, name, lat, lng, city, country):
         self.ident = ident
         self.name = name
@@ -11,17 +85,324 @@ class Airport:
         self.city = city
         self.country = country
 
+
+# === Airport view into an AirportStore row, same fields as Airport, created on demand ===
+class AirportView:
+    __slots__ = ("_store", "index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self.index = index
+
+    @property
+    def ident(self):
+        return self._store.idents[self.index]
+
+    @property
+    def name(self):
+        return self._store.names[self.index]
+
+    @property
+    def lat(self):
+        return float(self._store.lats[self.index])
+
+    @property
+    def lng(self):
+        return float(self._store.lngs[self.index])
+
+    @property
+    def city(self):
+        return self._store.cities[self.index]
+
+    @property
+    def country(self):
+        return self._store.countries[self.index]
+
+
+# === Read-only sequence of the store's rows, a view is made only for the row that is read ===
+class AirportRows:
+    __slots__ = ("_store",)
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [AirportView(self._store, j) for j in range(*i.indices(len(self._store)))]
+        if i < 0:
+            i += len(self._store)
+        if not 0 <= i < len(self._store):
+            raise IndexError("airport position out of range")
+        return AirportView(self._store, i)
+
+    def __iter__(self):
+        return (AirportView(self._store, i) for i in range(len(self._store)))
+
+class Country:
+    def __init__(self, code, name, airport_count, lat, lng):
+        self.code = code
+        self.name = name
+        self.airport_count = airport_count
+        self.lat = lat
+        self.lng = lng
+
+# === Immutable snapshot of the airport table, shared by the whole process ===
+class AirportCatalog:
+    def __init__(self, airports, country_names=None, version=1):
+        if not isinstance(airports, AirportStore):
+            airports = AirportStore.from_airports(airports)
+        self.store = airports
+        self.airports = AirportRows(airports)
+        self.version = version
+        self.loaded_at = time.time()
+
+        # === Indexes of positions: ident -> position, ICAO -> position, country -> positions ===
+        self.positions = {ident: position for position, ident in enumerate(airports.idents)}
+        if all(ident == ident.upper() for ident in airports.idents):
+            self.by_ident = self.positions
+        else:
+            self.by_ident = {ident.upper(): position for position, ident in enumerate(airports.idents)}
+        by_country = {}
+        for position, country in enumerate(airports.countries):
+            by_country.setdefault(country.upper(), []).append(position)
+        self.by_country = {code: np.asarray(positions, dtype=np.int32) for code, positions in by_country.items()}
+        # --- Built from names and cities, so with lazy fields only on the first search ---
+        self._words = None
+        self._words_lock = threading.Lock()
+        if self.store.details_loaded:
+            self._words = self._build_words()
+
+        self.lats = self.store.lats
+        self.lngs = self.store.lngs
+        checksum = hashlib.sha1("\n".join(self.store.idents).encode())
+        checksum.update(self.lats.tobytes())
+        checksum.update(self.lngs.tobytes())
+        self.checksum = checksum.hexdigest()
+        self.grid = SpatialGrid(self.lats, self.lngs)
+        self.countries = self._build_countries(country_names or {})
+        self._distances = None
+        self._distances_lock = threading.Lock()
+
+    # === All-pairs distance matrix, built (or loaded from disk) on first use ===
+    @property
+    def distances(self):
+        if self._distances is None:
+            with self._distances_lock:
+                if self._distances is None:
+                    self._distances = DistanceMatrix(self.lats, self.lngs, cache_key=self.checksum[:16])
+        return self._distances
+
+    def __len__(self):
+        return len(self.airports)
+
+    # === Airport by ICAO code (any case), or None ===
+    def find(self, code):
+        position = self.by_ident.get(code.upper())
+        return None if position is None else self.store.airport(position)
+
+    # === Airports in a country, in name order ===
+    def in_country(self, code):
+        return [self.store.airport(int(p)) for p in self.by_country.get(code.upper(), ())]
+
+    # === Countries that have airports: name, airport count and centroid ===
+    def _build_countries(self, country_names):
+        lat = np.radians(self.lats)
+        lng = np.radians(self.lngs)
+        xyz = np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+        countries = {}
+        for code, positions in self.by_country.items():
+            x, y, z = xyz[positions].mean(axis=0)
+            countries[code] = Country(
+                code=code,
+                name=country_names.get(code, code),
+                airport_count=len(positions),
+                lat=float(np.degrees(np.arctan2(z, np.hypot(x, y)))),
+                lng=float(np.degrees(np.arctan2(y, x)))
+            )
+        return countries
+
+    # === Sorted (word, position) pairs over every airport's name and city ===
+    def _build_words(self):
+        names, cities = self.store.details()
+        words = set()
+        for position, (name, city) in enumerate(zip(names, cities)):
+            for text in (name, city):
+                for word in (text or "").lower().split():
+                    words.add((word, position))
+        return sorted(words)
+
+    def _word_index(self):
+        if self._words is None:
+            with self._words_lock:
+                if self._words is None:
+                    self._words = self._build_words()
+        return self._words
+
+    # === Airports whose name or city has a word starting with prefix, in name order ===
+    def search(self, prefix):
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        words = self._word_index()
+        positions = set()
+        i = bisect_left(words, (prefix, -1))
+        while i < len(words) and words[i][0].startswith(prefix):
+            positions.add(words[i][1])
+            i += 1
+        return [self.airports[p] for p in sorted(positions)]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+ROUTE_CACHE_SIZE = int(os.getenv('ROUTE_CACHE_SIZE', 4096))
+
+# === Rows per fetchmany() while loading the airport table ===
+CATALOG_FETCH_SIZE = int(os.getenv('CATALOG_FETCH_SIZE', 1000))
+# === Load airport names and municipalities on first use instead of at startup ===
+CATALOG_LAZY_FIELDS = os.getenv('CATALOG_LAZY_FIELDS', '0') == '1'
+
+# === Startup from a catalog snapshot file instead of the DB (see catalog_snapshot.py) ===
+CATALOG_SNAPSHOT = os.getenv('CATALOG_SNAPSHOT')
+# === Compare the snapshot with the DB in the background and reload if it is stale (0 = no DB at all) ===
+CATALOG_SNAPSHOT_VERIFY = os.getenv('CATALOG_SNAPSHOT_VERIFY', '1') == '1'
+
+# === Routes shared by all players, keyed by (catalog version, origin, destination, stops) ===
+route_cache = LRUCache(ROUTE_CACHE_SIZE)
+
+
+AIRPORTS_WHERE = "FROM airport WHERE type IN ('large_airport') AND name NOT LIKE '%CLICK HERE%' ORDER BY name"
+
+
+# === Stream rows from an unbuffered cursor, batch_size at a time ===
+def stream_rows(sql, batch_size=CATALOG_FETCH_SIZE):
+    with connection() as yhteys:
+        cursor = yhteys.cursor(buffered=False)
+        cursor.execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+
+# === Load large airports from DB, straight into the columns (no full result list) ===
+# lazy_fields=True leaves name and municipality out, they are loaded on first access.
+def load_airports(lazy_fields=CATALOG_LAZY_FIELDS):
+    columns = "ident, latitude_deg, longitude_deg, iso_country" if lazy_fields else \
+        "ident, latitude_deg, longitude_deg, iso_country, name, municipality"
+    idents, lats, lngs, countries, names, cities = [], array('d'), array('d'), [], [], []
+    for row in stream_rows(f"SELECT {columns} {AIRPORTS_WHERE};"):
+        idents.append(row[0])
+        lats.append(row[1])
+        lngs.append(row[2])
+        countries.append(row[3])
+        if not lazy_fields:
+            names.append(row[4])
+            cities.append(row[5] or 'N/A')
+
+    if lazy_fields:
+        return AirportStore(idents, None, lats, lngs, None, countries, load_details=load_airport_details)
+    return AirportStore(idents, names, lats, lngs, cities, countries)
+
+
+# === (names, cities) for the given idents, in the same order ===
+def load_airport_details(idents):
+    positions = {ident: position for position, ident in enumerate(idents)}
+    names = ["" for _ in idents]
+    cities = ["N/A" for _ in idents]
+    for ident, name, city in stream_rows(f"SELECT ident, name, municipality {AIRPORTS_WHERE};"):
+        position = positions.get(ident)
+        if position is not None:
+            names[position] = name
+            cities[position] = city or 'N/A'
+    return names, cities
+
+
+# === Load country names from DB ===
+def load_country_names():
+    sql = "SELECT iso_country, name FROM country;"
+    with connection() as yhteys:
+        cursor = yhteys.cursor()
+        cursor.execute(sql)
+        result = cursor.fetchall()
+    return {code.upper(): name for code, name in result}
+
+
+# === Shared catalog, loaded on first use ===
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = load_snapshot_catalog() if CATALOG_SNAPSHOT else None
+            if _catalog is None:
+                _catalog = AirportCatalog(load_airports(), load_country_names())
+    return _catalog
+
+
+# === Catalog from the CATALOG_SNAPSHOT file, None if it is missing or unreadable ===
+def load_snapshot_catalog():
+    from catalog_snapshot import SnapshotError, read_snapshot, verify_in_background
+
+    if not os.path.exists(CATALOG_SNAPSHOT):
+        print(f"⚠️ Catalog snapshot {CATALOG_SNAPSHOT} not found, loading airports from the DB.")
+        return None
+    try:
+        store, country_names, _ = read_snapshot(CATALOG_SNAPSHOT)
+    except (OSError, SnapshotError) as e:
+        print(f"⚠️ {e}, loading airports from the DB.")
+        return None
+    if CATALOG_SNAPSHOT_VERIFY:
+        verify_in_background(CATALOG_SNAPSHOT, reload_catalog)
+    return AirportCatalog(store, country_names)
+
+
+# === Reload catalog from DB and swap it in atomically ===
+def reload_catalog():
+    global _catalog
+    with _catalog_lock:
+        version = _catalog.version + 1 if _catalog else 1
+        _catalog = AirportCatalog(load_airports(), load_country_names(), version)
+    return _catalog
+
+
 class AirportManager:
-    def __init__(self):
-        self.yhteys = get_connection()
-        self.all_airports = self.get_all_airports()
-    
+    # === catalog=None follows the shared catalog, also after reload_catalog() ===
+    def __init__(self, catalog=None):
+        self._catalog = catalog
+
+    @property
+    def catalog(self):
+        if self._catalog is not None:
+            return self._catalog
+        return get_catalog()
+
+    @property
+    def all_airports(self):
+        return self.catalog.airports
+
     # ==== Calculate distance between two airports ====
     def calc_distance(self, airport1, airport2):
-        return distance.distance((airport1.lat, airport1.lng), (airport2.lat, airport2.lng)).kilometers
+        positions = self.catalog.positions
+        i = positions.get(airport1.ident)
+        j = positions.get(airport2.ident)
+        if i is not None and j is not None:
+            record_distance("matrix")
+            return self.catalog.distances.distance(i, j)
+        record_distance("point")
+        return point_distance(float(airport1.lat), float(airport1.lng), float(airport2.lat), float(airport2.lng))
 
     # === Calculate total distance for route ===
     def total_route_distance(self, route):
+        positions = [self.catalog.positions.get(airport.ident) for airport in route]
+        if None not in positions:
+            record_distance("matrix", max(len(positions) - 1, 0))
+            return self.catalog.distances.route_distance(positions)
         total = 0
         for i in range(len(route) - 1):
             total += self.calc_distance(route[i], route[i + 1])
@@ -29,110 +410,149 @@ class AirportManager:
 
     # === Find airport by ICAO code ===
     def find_airport(self, code):
-        for airport in self.all_airports:
-            if airport.ident.upper() == code.upper():
-                return airport
-        return None
+        if not code:
+            return None
+        return self.catalog.find(code)
 
-    # === Get all airports from DB ===
+    # === Get all airports from the shared catalog ===
     def get_all_airports(self):
-        sql = "SELECT ident, name, latitude_deg, longitude_deg, municipality, iso_country FROM airport WHERE type IN ('large_airport') AND name NOT LIKE '%CLICK HERE%' ORDER BY name;"
-        cursor = self.yhteys.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        
-        airports = []
-        for row in result:
-            airports.append(
-                Airport(
-                    ident=row[0],
-                    name=row[1],
-                    lat=row[2],
-                    lng=row[3],
-                    city=row[4] or 'N/A',
-                    country=row[5]
-                )
-            )
-        return airports
+        return list(self.all_airports)
 
     # === Get airports in a specific country ===
     def get_airports_by_country(self, country_code):
-        sql = f"SELECT DISTINCT airport.ident, airport.name, airport.municipality, country.iso_country, country.name FROM airport, country WHERE airport.iso_country = country.iso_country AND airport.type IN ('large_airport') AND airport.name NOT LIKE '%CLICK HERE%' AND country.iso_country = '{country_code}' ORDER BY airport.name;"
-        cursor = self.yhteys.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchall()
-        
-        airports = []
-        for row in result:
-            airports.append(
-                Airport(
-                    ident=row[0],
-                    name=row[1],
-                    lat=None,
-                    lng=None,
-                    city=row[2] or 'N/A',
-                    country=row[3]
-                )
-            )
+        if not country_code:
+            return []
+        return self.catalog.in_country(country_code)
+
+    # === Country codes that have at least one airport ===
+    def get_country_codes(self):
+        return sorted(self.catalog.by_country)
+
+    # === Search airports by name or city prefix ===
+    def search_airports(self, prefix, limit=None):
+        airports = self.catalog.search(prefix)
+        if limit is not None:
+            airports = airports[:limit]
         return airports
 
+    # === Get airports in a city ===
+    def get_airports_by_city(self, city):
+        city = " ".join((city or "").lower().split())
+        if not city:
+            return []
+        return [a for a in self.catalog.search(city.split()[0]) if a.city.lower() == city]
+
+    # === Airports within radius_km of an airport ===
+    def airports_within_radius(self, airport, radius_km):
+        positions = self.catalog.grid.within_radius(float(airport.lat), float(airport.lng), radius_km)
+        return [self.all_airports[p] for p in positions]
+
+    # === Airports that add at most max_detour_km when flying start -> airport -> end ===
+    def airports_within_detour(self, start_airport, end_airport, max_detour_km):
+        positions = self.catalog.grid.within_detour(
+            float(start_airport.lat), float(start_airport.lng),
+            float(end_airport.lat), float(end_airport.lng),
+            max_detour_km
+        )
+        return [self.all_airports[p] for p in positions]
+
     # === Main Function: Find optimal route with specified number of stops ===
-    def find_route_with_stops(self, start_airport, end_airport, num_stops=0):
+    # timeout: seconds before the best route found so far is returned (None = ROUTE_DEADLINE, 0 = none)
+    def find_route_with_stops(self, start_airport, end_airport, num_stops=0, timeout=None):
+        route, _ = self.search_route_with_stops(start_airport, end_airport, num_stops, timeout)
+        return route
+
+    # === (route or None, complete), complete=False when the deadline cut the search short ===
+    # Timed under the old name: every route search goes through here, cached or not.
+    @timed("find_route_with_stops")
+    def search_route_with_stops(self, start_airport, end_airport, num_stops=0, timeout=None):
         if num_stops == 0:
-            return [start_airport, end_airport]
+            return [start_airport, end_airport], True
 
         # === Find candidate airports (not too far from direct route) ===
-        direct_dist = self.calc_distance(start_airport, end_airport)
-        candidates = []
-
-        for airport in self.all_airports:
-            if airport.ident in [start_airport.ident, end_airport.ident]:
-                continue
-            via_dist = self.calc_distance(start_airport, airport) + self.calc_distance(airport, end_airport)
-            if via_dist - direct_dist <= 1000:  # Max 1000km detour
-                candidates.append(airport)
+        candidates = [
+            airport for airport in self.airports_within_detour(start_airport, end_airport, 1000)  # Max 1000km detour
+            if airport.ident not in (start_airport.ident, end_airport.ident)
+        ]
 
         # === If not enough candidates for the requested number of stops, return None ===
         if len(candidates) < num_stops:
             print(f"❌ Not enough candidate airports for {num_stops} stops. Only {len(candidates)} available.")
-            return None
+            return None, True
 
-        # === Select best stops ===
-        if num_stops <= 3 and len(candidates) <= 15:
-            # === Small numbers: try combinations ===
-            best_route = None
-            best_distance = float('inf')
-
-            for stop_combo in combinations(candidates[:15], num_stops):
-                # === Try all orders ===
-                for perm in permutations(stop_combo):
-                    route = [start_airport] + list(perm) + [end_airport]
-                    dist = self.total_route_distance(route)
-                    if dist < best_distance:
-                        best_distance = dist
-                        best_route = route
-            return best_route
+        # === Exact optimal order and choice of stops, in the route workers if enabled ===
+        positions = self.catalog.positions
+        route, _, complete = route_executor.search(
+            self.catalog.distances,
+            positions[start_airport.ident],
+            positions[end_airport.ident],
+            [positions[airport.ident] for airport in candidates],
+            num_stops,
+            timeout
+        )
+        if route is None:
+            return None, True
+        return [self.all_airports[position] for position in route], complete
 
-        else:
-            # === Greedy selection for larger numbers ===
-            selected = []
-            remaining = candidates[:20]  # Limit candidates
+    # === find_route_with_stops through the shared route cache, best-so-far routes are not cached ===
+    def find_route_cached(self, start_airport, end_airport, num_stops=0):
+        key = (self.catalog.version, start_airport.ident, end_airport.ident, num_stops)
+        missing = object()
+        route = route_cache.get(key, missing)
+        if route is missing:
+            route, complete = self.search_route_with_stops(start_airport, end_airport, num_stops)
+            route = tuple(route or ())
+            if complete:
+                route_cache.set(key, route)
+        return list(route) or None
+
+    # === Best route for every stop count 0..max_stops (None where no route exists) ===
+    def route_options(self, start_airport, end_airport, max_stops):
+        return [self.find_route_cached(start_airport, end_airport, stops) for stops in range(max_stops + 1)]
+
+    # === Best routes to several destinations for every stop count 0..max_stops, in one solver pass ===
+    # Returns {dest ident: [route or None for 0..max_stops stops]} and fills the route cache.
+    # Past ROUTE_DEADLINE the remaining routes are best-so-far and are not cached.
+    def quote_routes(self, start_airport, end_airports, max_stops):
+        catalog = self.catalog
+        deadline = time.monotonic() + route_executor.deadline if route_executor.deadline else None
+        positions = catalog.positions
+        candidate_lists = [
+            [positions[a.ident] for a in self.airports_within_detour(start_airport, end, 1000)]  # Max 1000km detour
+            for end in end_airports
+        ]
+        solved = solve_routes_batch(
+            catalog.distances.matrix,
+            positions[start_airport.ident],
+            [positions[end.ident] for end in end_airports],
+            candidate_lists,
+            max_stops,
+            deadline
+        )
 
-            for _ in range(num_stops):
-                if not remaining:
-                    break
-                best_stop = min(remaining, 
-                              key=lambda x: self.total_route_distance([start_airport] + selected + [x] + [end_airport]))
-                selected.append(best_stop)
-                remaining.remove(best_stop)
+        quotes = {}
+        for end, options in zip(end_airports, solved):
+            routes = []
+            for num_stops, (route, _, complete) in enumerate(options):
+                route = [catalog.airports[p] for p in route] if route else None
+                if complete:
+                    route_cache.set((catalog.version, start_airport.ident, end.ident, num_stops), tuple(route or ()))
+                routes.append(route)
+            quotes[end.ident] = routes
+        return quotes
 
-            return [start_airport] + selected + [end_airport]
+    # === Country metadata (name, airport count, centroid) ===
+    def get_country(self, code):
+        if not code:
+            return None
+        return self.catalog.countries.get(code.upper())
+
+    # === Country name by ISO code, falls back to the code ===
+    def get_country_name(self, code):
+        country = self.get_country(code)
+        return country.name if country else code.upper()
 
     # === Show available countries with airports ===
     def show_countries(self):
-        sql = "SELECT DISTINCT country.iso_country, country.name FROM airport, country WHERE airport.iso_country = country.iso_country AND airport.type IN ('large_airport') ORDER BY country.name;"
-        cursor = self.yhteys.cursor()
-        cursor.execute(sql)
-        countries = cursor.fetchall()
-        
-        return countries
\ No newline at end of file
+        countries = sorted(self.catalog.countries.values(), key=lambda c: c.name)
+        return [(c.code, c.name) for c in countries]
@@ -0,0 +1,66 @@
+import gzip
+import hashlib
+import json
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FIELDS = ("ident", "name", "lat", "lng", "city", "country")
+
+
+# === JSON body encoded once, with pre-compressed variants and one strong ETag per encoding ===
+class EncodedPayload:
+    def __init__(self, body):
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {"identity": (body, f'"{digest}"')}
+        self.variants["gzip"] = (gzip.compress(body, 9, mtime=0), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body), f'"{digest}-br"')
+
+    # === Best variant for an Accept-Encoding header: (encoding, body, etag) ===
+    def select(self, accept_encoding):
+        accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.variants:
+                return (encoding,) + self.variants[encoding]
+        return ("identity",) + self.variants["identity"]
+
+
+def encode_airports(catalog, compact=False):
+    store = catalog.store
+    columns = {
+        "ident": list(store.idents),
+        "name": list(store.names),
+        "lat": store.lats.tolist(),
+        "lng": store.lngs.tolist(),
+        "city": list(store.cities),
+        "country": list(store.countries),
+    }
+    if compact:
+        data = columns
+    else:
+        data = [dict(zip(FIELDS, row)) for row in zip(*(columns[field] for field in FIELDS))]
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+_payloads = {}
+_payloads_lock = threading.Lock()
+
+
+# === Encoded /api/airports payload for a catalog, built once per catalog version ===
+def airports_payload(catalog, compact=False):
+    key = (catalog.version, catalog.checksum, compact)
+    payload = _payloads.get(key)
+    if payload is None:
+        with _payloads_lock:
+            payload = _payloads.get(key)
+            if payload is None:
+                payload = EncodedPayload(encode_airports(catalog, compact))
+                # === Only keep payloads of the current catalog ===
+                for old_key in [k for k in _payloads if k[:2] != key[:2]]:
+                    del _payloads[old_key]
+                _payloads[key] = payload
+    return payload
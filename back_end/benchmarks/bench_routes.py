@@ -0,0 +1,289 @@
+# === Route and stage micro-benchmarks on the fixture catalog, against a stored baseline ===
+# Run from back_end:
+#   python benchmarks/bench_routes.py                 compare with baseline_routes.json
+#   python benchmarks/bench_routes.py --save          store the current timings as the new baseline
+#   python benchmarks/bench_routes.py --threshold 0.5 allowed slowdown before failing (default 0.25 = +25 %)
+# Every case is also run on the original geopy + permutations implementation for comparison.
+# Exit code 1 if a case is slower than baseline * (1 + threshold), by more than 10 us, and its
+# speedup over the original code also dropped by more than threshold. The last condition
+# cancels out a machine that is slower as a whole today than when the baseline was saved.
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from itertools import combinations, permutations
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+os.environ.setdefault("DB_PORT", "3306")
+
+from geopy import distance
+
+from airport import AirportCatalog, AirportManager, AirportStore
+from fixtures import AIRPORTS, COUNTRIES
+from stage import Stage
+from stage_planner import stage_planner
+
+BASELINE_PATH = os.path.join(BENCHMARKS, "baseline_routes.json")
+THRESHOLD = 0.25
+# === Each case runs REPEATS x (enough calls to take about MIN_SECONDS), the fastest repeat counts ===
+REPEATS = 7
+RETRIES = 2
+MIN_SECONDS = 0.2
+# === Slowdowns below this are timer and scheduler noise on microsecond cases, never a regression ===
+MIN_REGRESSION_SECONDS = 10e-6
+
+SHORT_HAUL = ("EFHK", "LFPG")
+LONG_HAUL = ("EFHK", "YSSY")
+ROUTE = ("EFHK", "EDDF", "OMDB", "VTBS", "YSSY")
+STAGE_PLACES = {
+    "short": ("EFHK", {"SE": "ESSA", "DE": "EDDM", "PL": "EPWA"}),
+    "long": ("EFHK", {"BR": "SBGR", "JP": "RJTT", "ZA": "FAOR"}),
+}
+
+
+# === The route code as it was: geopy distances, combinations/permutations, greedy above 3 stops ===
+class LegacyRoutes:
+    def __init__(self, airports):
+        self.all_airports = list(airports)
+
+    def find_airport(self, code):
+        for airport in self.all_airports:
+            if airport.ident.upper() == code.upper():
+                return airport
+        return None
+
+    def calc_distance(self, airport1, airport2):
+        return distance.distance((airport1.lat, airport1.lng), (airport2.lat, airport2.lng)).kilometers
+
+    def total_route_distance(self, route):
+        total = 0
+        for i in range(len(route) - 1):
+            total += self.calc_distance(route[i], route[i + 1])
+        return total
+
+    def find_route_with_stops(self, start_airport, end_airport, num_stops=0):
+        if num_stops == 0:
+            return [start_airport, end_airport]
+
+        direct_dist = self.calc_distance(start_airport, end_airport)
+        candidates = []
+        for airport in self.all_airports:
+            if airport.ident in [start_airport.ident, end_airport.ident]:
+                continue
+            via_dist = self.calc_distance(start_airport, airport) + self.calc_distance(airport, end_airport)
+            if via_dist - direct_dist <= 1000:
+                candidates.append(airport)
+
+        if len(candidates) < num_stops:
+            return None
+
+        if num_stops <= 3 and len(candidates) <= 15:
+            best_route = None
+            best_distance = float('inf')
+            for stop_combo in combinations(candidates[:15], num_stops):
+                for perm in permutations(stop_combo):
+                    route = [start_airport] + list(perm) + [end_airport]
+                    dist = self.total_route_distance(route)
+                    if dist < best_distance:
+                        best_distance = dist
+                        best_route = route
+            return best_route
+
+        selected = []
+        remaining = candidates[:20]
+        for _ in range(num_stops):
+            if not remaining:
+                break
+            best_stop = min(remaining,
+                            key=lambda x: self.total_route_distance([start_airport] + selected + [x] + [end_airport]))
+            selected.append(best_stop)
+            remaining.remove(best_stop)
+        return [start_airport] + selected + [end_airport]
+
+    def get_shortest_route(self, session_state):
+        start_airport = self.find_airport(session_state['origin'])
+        dest_airports = [(country, self.find_airport(icao)) for country, icao in session_state['places'].items()]
+        best_route = None
+        best_distance = 10000000000
+        for perm in permutations(dest_airports):
+            route = [start_airport] + [airport for _, airport in perm]
+            dist = self.total_route_distance(route)
+            if dist < best_distance:
+                best_distance = dist
+                best_route = route
+        return {'route': best_route, 'total_distance': best_distance}
+
+
+# === Calls per batch, enough to take about MIN_SECONDS ===
+def calls_for(func):
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - started >= MIN_SECONDS or number >= 1 << 20:
+            return number
+        number *= 2
+
+
+def run_batch(func, number):
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - started) / number
+
+
+# === (current, legacy) seconds per call: best of REPEATS (as timeit does), noise only ever makes a run slower ===
+# Current and legacy batches alternate, so both see the same machine load.
+def measure(current, legacy):
+    numbers = calls_for(current), calls_for(legacy)
+    timings = [], []
+    for _ in range(REPEATS):
+        timings[0].append(run_batch(current, numbers[0]))
+        timings[1].append(run_batch(legacy, numbers[1]))
+    return min(timings[0]), min(timings[1])
+
+
+# === Slower than baseline by more than threshold and MIN_REGRESSION_SECONDS, and relative to the legacy run ===
+def is_regression(seconds, baseline_seconds, threshold, legacy_seconds=None, baseline_legacy_seconds=None):
+    if seconds <= baseline_seconds * (1 + threshold) or seconds - baseline_seconds <= MIN_REGRESSION_SECONDS:
+        return False
+    if legacy_seconds is None or baseline_legacy_seconds is None:
+        return True
+    return seconds / legacy_seconds > baseline_seconds / baseline_legacy_seconds * (1 + threshold)
+
+
+def route_km(routes, route):
+    return routes.total_route_distance(route) if route else None
+
+
+# === (name, current function, legacy function, current km, legacy km) per case ===
+def build_cases(manager, legacy):
+    find = manager.find_airport
+    find_legacy = legacy.find_airport
+    cases = []
+
+    for label, (a, b) in (("short", SHORT_HAUL), ("long", LONG_HAUL)):
+        cases.append((
+            f"calc_distance[{label}]",
+            lambda a=find(a), b=find(b): manager.calc_distance(a, b),
+            lambda a=find_legacy(a), b=find_legacy(b): legacy.calc_distance(a, b),
+            manager.calc_distance(find(a), find(b)),
+            legacy.calc_distance(find_legacy(a), find_legacy(b)),
+        ))
+
+    route = [find(code) for code in ROUTE]
+    legacy_route = [find_legacy(code) for code in ROUTE]
+    cases.append((
+        f"total_route_distance[{len(ROUTE)}]",
+        lambda: manager.total_route_distance(route),
+        lambda: legacy.total_route_distance(legacy_route),
+        manager.total_route_distance(route),
+        legacy.total_route_distance(legacy_route),
+    ))
+
+    for label, (a, b) in (("short", SHORT_HAUL), ("long", LONG_HAUL)):
+        for stops in range(6):
+            start, end = find(a), find(b)
+            legacy_start, legacy_end = find_legacy(a), find_legacy(b)
+            cases.append((
+                f"find_route_with_stops[{label},{stops}]",
+                lambda start=start, end=end, stops=stops: manager.find_route_with_stops(start, end, stops),
+                lambda start=legacy_start, end=legacy_end, stops=stops: legacy.find_route_with_stops(start, end, stops),
+                route_km(manager, manager.find_route_with_stops(start, end, stops)),
+                route_km(legacy, legacy.find_route_with_stops(legacy_start, legacy_end, stops)),
+            ))
+
+    for label, (origin, places) in STAGE_PLACES.items():
+        session_state = {"origin": origin, "places": dict(places)}
+        stage = Stage(1)
+
+        # === Plans are cached across players, clear the cache to time the computation itself ===
+        def current(session_state=session_state, stage=stage):
+            stage_planner.cache.clear()
+            return stage.get_shortest_route(session_state, manager)
+
+        cases.append((
+            f"get_shortest_route[{label},{len(places)}]",
+            current,
+            lambda session_state=session_state: legacy.get_shortest_route(session_state),
+            current()["total_distance"],
+            legacy.get_shortest_route(session_state)["total_distance"],
+        ))
+    return cases
+
+
+def main():
+    save = "--save" in sys.argv
+    threshold = float(sys.argv[sys.argv.index("--threshold") + 1]) if "--threshold" in sys.argv else THRESHOLD
+
+    catalog = AirportCatalog(AirportStore(*zip(*AIRPORTS)), dict(COUNTRIES))
+    manager = AirportManager(catalog)
+    legacy = LegacyRoutes(catalog.airports)
+    baseline = {}
+    baseline_legacy = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            stored = json.load(f)
+        baseline = stored["cases"]
+        baseline_legacy = stored.get("legacy", {})
+
+    results = {}
+    legacy_results = {}
+    regressions = []
+    print(f"{'case':36s} {'current':>11s} {'baseline':>11s} {'change':>8s} {'legacy':>11s} {'speedup':>9s}"
+          f" {'km':>9s} {'legacy km':>10s}")
+
+    # === Not enough candidates prints a warning per call, keep the table readable ===
+    with contextlib.redirect_stdout(io.StringIO()) as quiet:
+        cases = build_cases(manager, legacy)
+    for name, current, old, km, legacy_km in cases:
+        with contextlib.redirect_stdout(quiet):
+            seconds, legacy_seconds = measure(current, old)
+        results[name] = seconds
+        legacy_results[name] = legacy_seconds
+
+        change = ""
+        baseline_text = "-"
+        if name in baseline:
+            baseline_text = f"{baseline[name] * 1e6:.1f}us"
+            compare = (baseline[name], threshold, legacy_seconds, baseline_legacy.get(name))
+            # === A slow run is measured again before it counts as a regression ===
+            for _ in range(RETRIES):
+                if not is_regression(seconds, *compare):
+                    break
+                with contextlib.redirect_stdout(quiet):
+                    seconds, legacy_seconds = measure(current, old)
+                compare = (baseline[name], threshold, legacy_seconds, baseline_legacy.get(name))
+            results[name] = seconds
+            legacy_results[name] = legacy_seconds
+            ratio = seconds / baseline[name]
+            change = f"{(ratio - 1) * 100:+7.0f}%"
+            if is_regression(seconds, *compare):
+                regressions.append(name)
+                change += " !"
+        print(f"{name:36s} {seconds * 1e6:9.1f}us {baseline_text:>11s} {change:>8s}"
+              f" {legacy_seconds * 1e6:9.1f}us {legacy_seconds / seconds:8.1f}x"
+              f" {km if km is None else round(km):>9} {legacy_km if legacy_km is None else round(legacy_km):>10}")
+
+    if save:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"created_at": time.strftime("%Y-%m-%d %H:%M:%S"), "cases": results, "legacy": legacy_results},
+                      f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return 0
+    if regressions:
+        print(f"❌ Slower than baseline (and than the legacy code) by more than {threshold * 100:.0f}%:"
+              f" {', '.join(regressions)}")
+        return 1
+    print(f"✅ No case slower than baseline by more than {threshold * 100:.0f}%." if baseline
+          else "No baseline yet, run with --save to store one.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# === Requests/sec and latency: threaded Flask server vs. ASGI mode (uvicorn) ===
+# Run from back_end:  python benchmarks/bench_serving.py [requests] [concurrency] [upstream_ms]
+# Needs: pip install httpx uvicorn a2wsgi==1.10.10
+#
+# Both servers use a fake airport catalog, a SQLite copy of the fixture DB (DB_BACKEND=sqlite)
+# and a local stub in place of OpenWeather, with the weather cache disabled so every weather
+# request waits for the stub.
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACK_END = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACK_END)
+os.environ.setdefault("DB_PORT", "3306")
+
+import httpx
+
+from fixtures import create_fixture_db, start_weather_stub
+from memory_airports import fake_rows
+
+AIRPORTS = 600
+SYNC_PORT = 5101
+ASGI_PORT = 5102
+
+
+# === Server process: python bench_serving.py serve sync|asgi port ===
+def serve(mode, port):
+    import logging
+    import airport
+    from airport import AirportCatalog, AirportStore
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    airport._catalog = AirportCatalog(AirportStore(*zip(*fake_rows(AIRPORTS))))
+
+    if mode == "sync":
+        from werkzeug.serving import run_simple
+        from lentopeli_api import create_app
+        run_simple("127.0.0.1", port, create_app(), threaded=True)
+    else:
+        import uvicorn
+        uvicorn.run("lentopeli_asgi:app", host="127.0.0.1", port=port, log_level="error")
+
+
+def wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run_load(base_url, paths, concurrency):
+    latencies = {}
+    errors = 0
+    queue = list(paths)
+
+    async def worker(client):
+        nonlocal errors
+        while queue:
+            path = queue.pop()
+            kind = path.split("?")[0].split("/")[2] if path.count("/") > 1 else "index"
+            started = time.perf_counter()
+            try:
+                response = await client.get(base_url + path)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.setdefault(kind, []).append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, errors
+
+
+def report(mode, elapsed, latencies, errors):
+    total = sum(len(values) for values in latencies.values())
+    print(f"{mode:5s} {total / elapsed:8.1f} req/s  errors: {errors}")
+    for kind, values in sorted(latencies.items()):
+        print(f"      {kind:15s} n={len(values):5d}  p50 {percentile(values, 50) * 1000:7.1f} ms"
+              f"  p99 {percentile(values, 99) * 1000:7.1f} ms")
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    upstream_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    stub = start_weather_stub(upstream_ms)
+    workdir = tempfile.TemporaryDirectory()
+    env = dict(
+        os.environ,
+        DB_BACKEND="sqlite",
+        DB_SQLITE_PATH=create_fixture_db(os.path.join(workdir.name, "fixture.db")),
+        DISTANCE_CACHE_DIR=os.path.join(workdir.name, "cache"),
+        OPENWEATHER_URL=f"http://127.0.0.1:{stub.server_address[1]}/",
+        OPENWEATHER_API_KEY="bench",
+        WEATHER_CACHE_TTL="0",
+        WEATHER_RATE="1000000",
+        WEATHER_BURST="1000000",
+        WEATHER_POOL_SIZE=str(concurrency),
+    )
+
+    # === Mixed traffic: weather popups, route quotes and the airport list ===
+    rng = random.Random(1)
+    idents = [row[0] for row in fake_rows(AIRPORTS)]
+    paths = []
+    for _ in range(total):
+        roll = rng.random()
+        if roll < 0.6:
+            paths.append(f"/api/weather/{rng.choice(idents)}")
+        elif roll < 0.9:
+            paths.append(f"/api/layover_route/{rng.choice(idents)}/{rng.choice(idents)}?stops=2")
+        else:
+            paths.append("/api/airports?format=compact")
+
+    # === Client, servers and stub share the machine, results on 1-2 cores mostly measure the client ===
+    print(f"requests: {total}, concurrency: {concurrency}, upstream latency: {upstream_ms:.0f} ms, cpus: {os.cpu_count()}")
+    for mode, port in (("sync", SYNC_PORT), ("asgi", ASGI_PORT)):
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", mode, str(port)], cwd=BACK_END, env=env)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_up(base_url + "/", process)
+            # === Warm up: distance matrix, payload encoding, connections ===
+            asyncio.run(run_load(base_url, paths[:100], concurrency))
+            report(mode, *asyncio.run(run_load(base_url, paths, concurrency)))
+        finally:
+            process.terminate()
+            process.wait()
+    workdir.cleanup()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,146 @@
+# === Brute-force cross-check of the exact route solvers on small random instances ===
+# Run from back_end:  python benchmarks/check_routes.py [instances] [seed]
+#
+# search_route, solve_routes_batch (route_solver.py) and held_karp (stage_planner.py) must
+# return the same distance as trying every permutation, and a route that really has that
+# distance. Run it after changing either file. Exit code 1 on any mismatch.
+import os
+import random
+import sys
+import time
+from itertools import permutations
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+import numpy as np
+
+import route_solver
+from distances import haversine_km
+from route_solver import search_route, solve_routes_batch
+from stage_planner import held_karp
+
+INSTANCES = 300
+MAX_NODES = 11
+MAX_STOPS = 4
+MAX_TARGETS = 6
+TOLERANCE_KM = 1e-3
+
+
+# === float32 matrix like DistanceMatrix: points on the globe, or arbitrary (non-metric) weights ===
+def random_matrix(rng, n):
+    if rng.random() < 0.7:
+        lats = np.array([rng.uniform(-60, 70) for _ in range(n)])
+        lngs = np.array([rng.uniform(-180, 180) for _ in range(n)])
+        matrix = haversine_km(lats[:, None], lngs[:, None], lats[None, :], lngs[None, :])
+    else:
+        matrix = np.array([[rng.uniform(1, 5000) for _ in range(n)] for _ in range(n)])
+        np.fill_diagonal(matrix, 0)
+    return matrix.astype(np.float32)
+
+
+def path_km(matrix, path):
+    return sum(float(matrix[a, b]) for a, b in zip(path, path[1:]))
+
+
+# === Shortest start -> k distinct candidates -> end by trying every ordered choice ===
+def brute_route(matrix, start, end, candidates, k):
+    candidates = [c for c in candidates if c not in (start, end)]
+    if len(candidates) < k:
+        return None
+    return min(path_km(matrix, (start,) + stops + (end,)) for stops in permutations(candidates, k))
+
+
+def brute_order(matrix, start, targets):
+    return min(path_km(matrix, (start,) + order) for order in permutations(targets))
+
+
+# === Problems with a returned route, or [] ===
+def check_route(matrix, route, distance, start, end, candidates, k, expected, exact=True):
+    if expected is None:
+        return [] if route is None else [f"route {route} where none exists"]
+    if route is None:
+        return [f"no route, expected {expected:.3f} km"]
+    problems = []
+    stops = route[1:-1]
+    if route[0] != start or route[-1] != end or len(stops) != k:
+        problems.append(f"route {route} is not {start} -> {k} stops -> {end}")
+    if len(set(stops)) != len(stops) or not set(stops) <= set(candidates) - {start, end}:
+        problems.append(f"route {route} repeats a stop or uses a non-candidate")
+    if abs(path_km(matrix, route) - distance) > TOLERANCE_KM:
+        problems.append(f"reported {distance:.3f} km, route is {path_km(matrix, route):.3f} km")
+    if exact and abs(distance - expected) > TOLERANCE_KM:
+        problems.append(f"{distance:.3f} km, brute force {expected:.3f} km")
+    return problems
+
+
+def check_instance(rng):
+    n = rng.randint(3, MAX_NODES)
+    matrix = random_matrix(rng, n)
+    nodes = list(range(n))
+    start, end = rng.sample(nodes, 2)
+    candidates = rng.sample(nodes, rng.randint(0, min(n, 7)))
+    failures = []
+
+    for k in range(MAX_STOPS + 1):
+        expected = brute_route(matrix, start, end, candidates, k)
+        route, distance, complete = search_route(matrix, start, end, candidates, k)
+        failures += [f"search_route k={k}: {p}" for p in
+                     check_route(matrix, route, distance, start, end, candidates, k, expected)]
+        if not complete:
+            failures.append(f"search_route k={k}: incomplete without a deadline")
+
+        # === Past deadline: any valid route, the best one only if the search still finished ===
+        route, distance, complete = search_route(matrix, start, end, candidates, k, time.monotonic() - 1)
+        failures += [f"search_route k={k} past deadline: {p}" for p in
+                     check_route(matrix, route, distance, start, end, candidates, k, expected, exact=complete)]
+
+    ends = rng.sample([v for v in nodes if v != start], rng.randint(1, min(3, n - 1)))
+    candidate_lists = [rng.sample(nodes, rng.randint(0, min(n, 6))) for _ in ends]
+    # --- Small budgets split the destinations into several chunks ---
+    route_solver.BATCH_MAX_CELLS = rng.choice([1, 200, 2_000_000])
+    batch = solve_routes_batch(matrix, start, ends, candidate_lists, MAX_STOPS)
+    late = solve_routes_batch(matrix, start, ends, candidate_lists, MAX_STOPS, time.monotonic() - 1)
+    for end, candidates, options in zip(ends, candidate_lists, batch):
+        for k, (route, distance, complete) in enumerate(options):
+            if not complete:
+                failures.append(f"solve_routes_batch end={end} k={k}: incomplete without a deadline")
+            expected = brute_route(matrix, start, end, candidates, k)
+            failures += [f"solve_routes_batch end={end} k={k}: {p}" for p in
+                         check_route(matrix, route, distance, start, end, candidates, k, expected)]
+            route, distance, complete = late[ends.index(end)][k]
+            failures += [f"solve_routes_batch end={end} k={k} past deadline: {p}" for p in
+                         check_route(matrix, route, distance, start, end, candidates, k, expected, exact=complete)]
+
+    targets = rng.sample([v for v in nodes if v != start], rng.randint(0, min(MAX_TARGETS, n - 1)))
+    order, distance = held_karp(matrix, start, targets)
+    expected = brute_order(matrix, start, targets) if targets else 0.0
+    if sorted(order) != sorted(targets):
+        failures.append(f"held_karp: order {order} does not visit targets {targets}")
+    elif abs(distance - expected) > TOLERANCE_KM or abs(path_km(matrix, [start] + order) - distance) > TOLERANCE_KM:
+        failures.append(f"held_karp: {distance:.3f} km, brute force {expected:.3f} km")
+    return failures
+
+
+def main():
+    instances = int(sys.argv[1]) if len(sys.argv) > 1 else INSTANCES
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    rng = random.Random(seed)
+    # === Look at the clock on every node, so small instances also stop early at a deadline ===
+    route_solver.DEADLINE_CHECK_EVERY = 1
+
+    failed = 0
+    started = time.perf_counter()
+    for number in range(instances):
+        failures = check_instance(rng)
+        if failures:
+            failed += 1
+            print(f"❌ instance {number} (seed {seed}):")
+            for failure in failures:
+                print(f"   {failure}")
+    print(f"{instances - failed}/{instances} instances match brute force ({time.perf_counter() - started:.1f} s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+# === Fixture airport catalog: the airport and country tables in a SQLite file, and an OpenWeather stub ===
+# Used by the load test and benchmarks with DB_BACKEND=sqlite, so they run without MySQL.
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# === (ident, name, latitude_deg, longitude_deg, municipality, iso_country), one or more per tips country ===
+AIRPORTS = [
+    ("EFHK", "Helsinki Vantaa Airport", 60.3172, 24.9633, "Helsinki", "FI"),
+    ("EFOU", "Oulu Airport", 64.9301, 25.3546, "Oulu", "FI"),
+    ("ESSA", "Stockholm-Arlanda Airport", 59.6519, 17.9186, "Stockholm", "SE"),
+    ("ESGG", "Gothenburg Landvetter Airport", 57.6628, 12.2798, "Gothenburg", "SE"),
+    ("ENGM", "Oslo Gardermoen Airport", 60.1939, 11.1004, "Oslo", "NO"),
+    ("ENBR", "Bergen Airport Flesland", 60.2934, 5.2181, "Bergen", "NO"),
+    ("EKCH", "Copenhagen Kastrup Airport", 55.6179, 12.6560, "Copenhagen", "DK"),
+    ("EPWA", "Warsaw Chopin Airport", 52.1657, 20.9671, "Warsaw", "PL"),
+    ("EPKK", "Kraków John Paul II International Airport", 50.0777, 19.7848, "Kraków", "PL"),
+    ("LEMD", "Adolfo Suárez Madrid–Barajas Airport", 40.4719, -3.5626, "Madrid", "ES"),
+    ("LEBL", "Josep Tarradellas Barcelona-El Prat Airport", 41.2971, 2.0785, "Barcelona", "ES"),
+    ("LIRF", "Rome–Fiumicino Leonardo da Vinci International Airport", 41.8003, 12.2389, "Rome", "IT"),
+    ("LIMC", "Milan Malpensa International Airport", 45.6306, 8.7281, "Milan", "IT"),
+    ("LPPT", "Humberto Delgado Airport", 38.7813, -9.1359, "Lisbon", "PT"),
+    ("LPPR", "Francisco de Sá Carneiro Airport", 41.2481, -8.6814, "Porto", "PT"),
+    ("EGLL", "London Heathrow Airport", 51.4706, -0.4619, "London", "GB"),
+    ("EGCC", "Manchester Airport", 53.3537, -2.2750, "Manchester", "GB"),
+    ("LFPG", "Charles de Gaulle International Airport", 49.0097, 2.5479, "Paris", "FR"),
+    ("LFMN", "Nice-Côte d'Azur Airport", 43.6584, 7.2159, "Nice", "FR"),
+    ("LGAV", "Athens Eleftherios Venizelos International Airport", 37.9364, 23.9445, "Athens", "GR"),
+    ("EDDF", "Frankfurt am Main Airport", 50.0333, 8.5706, "Frankfurt", "DE"),
+    ("EDDM", "Munich Airport", 48.3538, 11.7861, "Munich", "DE"),
+    ("EHAM", "Amsterdam Airport Schiphol", 52.3086, 4.7639, "Amsterdam", "NL"),
+    ("EBBR", "Brussels Airport", 50.9014, 4.4844, "Brussels", "BE"),
+    ("LSZH", "Zürich Airport", 47.4647, 8.5492, "Zurich", "CH"),
+    ("LSGG", "Geneva Cointrin International Airport", 46.2381, 6.1090, "Geneva", "CH"),
+    ("LOWW", "Vienna International Airport", 48.1103, 16.5697, "Vienna", "AT"),
+    ("LKPR", "Václav Havel Airport Prague", 50.1008, 14.2600, "Prague", "CZ"),
+    ("LHBP", "Budapest Liszt Ferenc International Airport", 47.4298, 19.2611, "Budapest", "HU"),
+    ("EIDW", "Dublin Airport", 53.4213, -6.2701, "Dublin", "IE"),
+    ("UKBB", "Boryspil International Airport", 50.3450, 30.8947, "Kyiv", "UA"),
+    ("UUEE", "Sheremetyevo International Airport", 55.9726, 37.4146, "Moscow", "RU"),
+    ("ULLI", "Pulkovo Airport", 59.8003, 30.2625, "St. Petersburg", "RU"),
+    ("LTFM", "Istanbul Airport", 41.2753, 28.7519, "Istanbul", "TR"),
+    ("LTAI", "Antalya International Airport", 36.8987, 30.8005, "Antalya", "TR"),
+    ("HECA", "Cairo International Airport", 30.1219, 31.4056, "Cairo", "EG"),
+    ("GMMN", "Mohammed V International Airport", 33.3675, -7.5900, "Casablanca", "MA"),
+    ("FAOR", "O. R. Tambo International Airport", -26.1392, 28.2460, "Johannesburg", "ZA"),
+    ("FACT", "Cape Town International Airport", -33.9649, 18.6017, "Cape Town", "ZA"),
+    ("HKJK", "Jomo Kenyatta International Airport", -1.3192, 36.9278, "Nairobi", "KE"),
+    ("DNMM", "Murtala Muhammed International Airport", 6.5774, 3.3212, "Lagos", "NG"),
+    ("LLBG", "Ben Gurion International Airport", 32.0114, 34.8867, "Tel Aviv", "IL"),
+    ("OMDB", "Dubai International Airport", 25.2528, 55.3644, "Dubai", "AE"),
+    ("OMAA", "Zayed International Airport", 24.4330, 54.6511, "Abu Dhabi", "AE"),
+    ("OERK", "King Khalid International Airport", 24.9576, 46.6988, "Riyadh", "SA"),
+    ("OEJN", "King Abdulaziz International Airport", 21.6796, 39.1565, "Jeddah", "SA"),
+    ("OIIE", "Imam Khomeini International Airport", 35.4161, 51.1522, "Tehran", "IR"),
+    ("OPKC", "Jinnah International Airport", 24.9065, 67.1608, "Karachi", "PK"),
+    ("VIDP", "Indira Gandhi International Airport", 28.5665, 77.1031, "New Delhi", "IN"),
+    ("VABB", "Chhatrapati Shivaji International Airport", 19.0887, 72.8679, "Mumbai", "IN"),
+    ("VGHS", "Hazrat Shahjalal International Airport", 23.8433, 90.3978, "Dhaka", "BD"),
+    ("VTBS", "Suvarnabhumi Airport", 13.6811, 100.7470, "Bangkok", "TH"),
+    ("VVTS", "Tan Son Nhat International Airport", 10.8188, 106.6520, "Ho Chi Minh City", "VN"),
+    ("VVNB", "Noi Bai International Airport", 21.2212, 105.8070, "Hanoi", "VN"),
+    ("RPLL", "Ninoy Aquino International Airport", 14.5086, 121.0200, "Manila", "PH"),
+    ("WIII", "Soekarno-Hatta International Airport", -6.1256, 106.6560, "Jakarta", "ID"),
+    ("WMKK", "Kuala Lumpur International Airport", 2.7456, 101.7100, "Kuala Lumpur", "MY"),
+    ("WSSS", "Singapore Changi Airport", 1.3502, 103.9940, "Singapore", "SG"),
+    ("ZBAA", "Beijing Capital International Airport", 40.0801, 116.5850, "Beijing", "CN"),
+    ("ZSPD", "Shanghai Pudong International Airport", 31.1434, 121.8050, "Shanghai", "CN"),
+    ("RKSI", "Incheon International Airport", 37.4691, 126.4510, "Seoul", "KR"),
+    ("RJTT", "Tokyo Haneda International Airport", 35.5523, 139.7800, "Tokyo", "JP"),
+    ("RJAA", "Narita International Airport", 35.7647, 140.3860, "Tokyo", "JP"),
+    ("YSSY", "Sydney Kingsford Smith International Airport", -33.9461, 151.1770, "Sydney", "AU"),
+    ("YMML", "Melbourne International Airport", -37.6733, 144.8430, "Melbourne", "AU"),
+    ("KJFK", "John F Kennedy International Airport", 40.6398, -73.7789, "New York", "US"),
+    ("KLAX", "Los Angeles International Airport", 33.9425, -118.4080, "Los Angeles", "US"),
+    ("KORD", "Chicago O'Hare International Airport", 41.9786, -87.9048, "Chicago", "US"),
+    ("CYYZ", "Lester B. Pearson International Airport", 43.6772, -79.6306, "Toronto", "CA"),
+    ("CYVR", "Vancouver International Airport", 49.1939, -123.1840, "Vancouver", "CA"),
+    ("MMMX", "Licenciado Benito Juarez International Airport", 19.4363, -99.0721, "Mexico City", "MX"),
+    ("SBGR", "Guarulhos - Governador André Franco Montoro International Airport", -23.4356, -46.4731, "São Paulo", "BR"),
+    ("SBGL", "Rio Galeão – Tom Jobim International Airport", -22.8100, -43.2506, "Rio de Janeiro", "BR"),
+    ("SAEZ", "Ministro Pistarini International Airport", -34.8222, -58.5358, "Buenos Aires", "AR"),
+]
+
+COUNTRIES = [
+    ("FI", "Finland"), ("SE", "Sweden"), ("NO", "Norway"), ("DK", "Denmark"), ("PL", "Poland"),
+    ("ES", "Spain"), ("IT", "Italy"), ("PT", "Portugal"), ("GB", "United Kingdom"), ("FR", "France"),
+    ("GR", "Greece"), ("DE", "Germany"), ("NL", "Netherlands"), ("BE", "Belgium"), ("CH", "Switzerland"),
+    ("AT", "Austria"), ("CZ", "Czechia"), ("HU", "Hungary"), ("IE", "Ireland"), ("UA", "Ukraine"),
+    ("RU", "Russia"), ("TR", "Turkey"), ("EG", "Egypt"), ("MA", "Morocco"), ("ZA", "South Africa"),
+    ("KE", "Kenya"), ("NG", "Nigeria"), ("IL", "Israel"), ("AE", "United Arab Emirates"),
+    ("SA", "Saudi Arabia"), ("IR", "Iran"), ("PK", "Pakistan"), ("IN", "India"), ("BD", "Bangladesh"),
+    ("TH", "Thailand"), ("VN", "Vietnam"), ("PH", "Philippines"), ("ID", "Indonesia"), ("MY", "Malaysia"),
+    ("SG", "Singapore"), ("CN", "China"), ("KR", "South Korea"), ("JP", "Japan"), ("AU", "Australia"),
+    ("US", "United States"), ("CA", "Canada"), ("MX", "Mexico"), ("BR", "Brazil"), ("AR", "Argentina"),
+]
+
+# === Rows the loader must skip: other airport types ===
+OTHER_AIRPORTS = [
+    ("EFTP", "Tampere-Pirkkala Airport", 61.4141, 23.6044, "Tampere", "FI", "medium_airport"),
+    ("ESMS", "Malmö Sturup Airport", 55.5363, 13.3762, "Malmö", "SE", "medium_airport"),
+    ("EFHF", "Helsinki Malmi Airport", 60.2546, 25.0428, "Helsinki", "FI", "small_airport"),
+]
+
+
+# === Create (or recreate) the airport and country tables in a SQLite file ===
+def create_fixture_db(path):
+    yhteys = sqlite3.connect(path)
+    try:
+        with yhteys:
+            yhteys.execute("DROP TABLE IF EXISTS airport")
+            yhteys.execute("DROP TABLE IF EXISTS country")
+            yhteys.execute("""
+                CREATE TABLE airport (
+                    ident TEXT PRIMARY KEY,
+                    type TEXT,
+                    name TEXT,
+                    latitude_deg REAL,
+                    longitude_deg REAL,
+                    municipality TEXT,
+                    iso_country TEXT
+                )
+            """)
+            yhteys.execute("CREATE TABLE country (iso_country TEXT PRIMARY KEY, name TEXT)")
+            yhteys.executemany(
+                "INSERT INTO airport (ident, name, latitude_deg, longitude_deg, municipality, iso_country, type) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [row + ("large_airport",) for row in AIRPORTS] + OTHER_AIRPORTS
+            )
+            yhteys.executemany("INSERT INTO country (iso_country, name) VALUES (?, ?)", COUNTRIES)
+    finally:
+        yhteys.close()
+    return path
+
+
+# === Stand-in for OpenWeather that answers after upstream_ms, point OPENWEATHER_URL at it ===
+def start_weather_stub(upstream_ms=0):
+    body = json.dumps({
+        "weather": [{"main": "Clear", "description": "clear sky", "icon": "01d"}],
+        "wind": {"speed": 3.1},
+        "main": {"temp": 288.15}
+    }).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            time.sleep(upstream_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,202 @@
+# === Load test: N concurrent players walking the real game flow against a local server ===
+# Run from back_end:  python benchmarks/load_game.py [players] [games_per_player] [base_url]
+#
+# Without base_url a server is started on a SQLite copy of the fixture catalog
+# (DB_BACKEND=sqlite) with an OpenWeather stub, so no MySQL or API key is needed.
+# Reports throughput, latency percentiles per endpoint and DB queries per game.
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACK_END = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACK_END)
+
+import requests
+
+from fixtures import create_fixture_db, start_weather_stub
+
+PORT = 5110
+WRONG_GUESS_RATE = 0.3
+QUIT_RATE = 0.05
+MAX_REPLAYS = 2
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.outcomes = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, seconds, failed):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if failed:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def outcome(self, status):
+        with self._lock:
+            self.outcomes[status] = self.outcomes.get(status, 0) + 1
+
+
+# === One player: start -> (guess -> select-airport -> confirm-flight)* -> next stage / replay -> quit ===
+class Player:
+    def __init__(self, base_url, name, seed, recorder):
+        self.base_url = base_url
+        self.name = name
+        self.rng = random.Random(seed)
+        self.recorder = recorder
+        self.http = requests.Session()
+
+    def call(self, method, path, endpoint, json=None, expect=(200,)):
+        started = time.perf_counter()
+        response = self.http.request(method, self.base_url + path, json=json, timeout=60)
+        self.recorder.add(endpoint, time.perf_counter() - started, response.status_code not in expect)
+        return response
+
+    def post(self, path, **data):
+        return self.call("POST", path, f"POST {path}", dict(player_name=self.name, **data), expect=(200, 400)).json()
+
+    def play(self):
+        countries = self.post("/api/game/start")["countries"]
+        replays = 0
+        while True:
+            self.call("GET", f"/api/game/state/{self.name}", "GET /api/game/state")
+            country = countries[0]
+            if self.rng.random() < WRONG_GUESS_RATE:
+                self.post("/api/game/guess", guess="XX")
+            airports = self.post("/api/game/guess", guess=country)["airports"]
+            airport = self.rng.choice(airports)["ident"]
+
+            flight = self.post("/api/game/select-airport", airport_code=airport, country_code=country,
+                               stops=self.rng.choice([0, 0, 1, 2]))
+            if "error" in flight:
+                flight = self.post("/api/game/select-airport", airport_code=airport, country_code=country, stops=0)
+
+            if not flight.get("enough_co2"):
+                if replays >= MAX_REPLAYS:
+                    self.post("/api/game/end-lose")
+                    break
+                replays += 1
+                countries = self.post("/api/game/replay-stage")["countries"]
+                continue
+
+            result = self.post("/api/game/confirm-flight", airport_code=airport, country_code=country,
+                               distance=flight["distance"], co2=flight["co2_required"])
+            if result.get("game_complete"):
+                break
+            if result.get("stage_complete"):
+                countries = result["countries"]
+                replays = 0
+            else:
+                countries = result["countries_remaining"]
+
+            if self.rng.random() < QUIT_RATE:
+                self.post("/api/game/quit")
+                break
+
+        status = self.call("GET", f"/api/result/{self.name}", "GET /api/result").json().get("game_status")
+        self.recorder.outcome(status)
+
+
+# === Server process: python load_game.py serve port ===
+def serve(port):
+    import logging
+    from werkzeug.serving import run_simple
+    from lentopeli_api import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    run_simple("127.0.0.1", port, create_app(), threaded=True)
+
+
+def start_server(workdir):
+    stub = start_weather_stub()
+    env = dict(
+        os.environ,
+        DB_BACKEND="sqlite",
+        DB_SQLITE_PATH=create_fixture_db(os.path.join(workdir, "fixture.db")),
+        DISTANCE_CACHE_DIR=os.path.join(workdir, "cache"),
+        SESSION_BACKEND="memory",
+        OPENWEATHER_URL=f"http://127.0.0.1:{stub.server_address[1]}/",
+        OPENWEATHER_API_KEY="load-test",
+    )
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", str(PORT)], cwd=BACK_END, env=env,
+                               stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{PORT}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            requests.get(base_url + "/", timeout=1)
+            return process, base_url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not start")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(base_url, players, games):
+    recorder = Recorder()
+    before = requests.get(base_url + "/api/db/pool").json()
+
+    def player_loop(number):
+        for game in range(games):
+            Player(base_url, f"load-{number}", number * 1000 + game, recorder).play()
+
+    threads = [threading.Thread(target=player_loop, args=(number,)) for number in range(players)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    # === Results are written in the background, give the writer one flush interval ===
+    time.sleep(1.5)
+    after = requests.get(base_url + "/api/db/pool").json()
+    stats = requests.get(base_url + "/api/games/stats").json()
+
+    total = sum(len(values) for values in recorder.latencies.values())
+    finished = sum(recorder.outcomes.values())
+    queries = after.get("queries", 0) - before.get("queries", 0)
+    print(f"players: {players}, games: {finished} in {elapsed:.1f} s, outcomes: {recorder.outcomes}")
+    print(f"throughput: {total / elapsed:.1f} req/s, {finished / elapsed:.2f} games/s")
+    print(f"DB: {queries} queries ({queries / max(finished, 1):.2f} per game), "
+          f"{after['checkouts'] - before['checkouts']} checkouts, pool peak {after['peak_in_use']}/{after['size']}, "
+          f"{after['timeouts'] - before['timeouts']} timeouts")
+    print(f"games: {stats}")
+    print(f"{'endpoint':32s} {'n':>6s} {'err':>4s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'max ms':>8s}")
+    for endpoint, values in sorted(recorder.latencies.items()):
+        print(f"{endpoint:32s} {len(values):6d} {recorder.errors.get(endpoint, 0):4d}"
+              f" {percentile(values, 50) * 1000:8.1f} {percentile(values, 95) * 1000:8.1f}"
+              f" {percentile(values, 99) * 1000:8.1f} {max(values) * 1000:8.1f}")
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    if len(sys.argv) > 3:
+        return run(sys.argv[3].rstrip("/"), players, games)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process, base_url = start_server(workdir)
+        try:
+            run(base_url, players, games)
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,85 @@
+# === Memory per game: old per-game Airport lists vs. the shared compact catalog ===
+# Run from back_end:  python benchmarks/memory_airports.py [airports] [games]
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_PORT", "3306")
+
+from airport import Airport, AirportCatalog, AirportManager, AirportStore
+
+
+# === Airport as it was before: plain class with a __dict__ per instance ===
+class LegacyAirport:
+    def __init__(self, ident, name, lat, lng, city, country):
+        self.ident = ident
+        self.name = name
+        self.lat = lat
+        self.lng = lng
+        self.city = city
+        self.country = country
+
+
+def fake_rows(count):
+    rng = random.Random(1)
+    countries = [f"C{i:02d}" for i in range(60)]
+    rows = []
+    for i in range(count):
+        rows.append((
+            f"X{i:05d}",
+            f"Airport number {i} International",
+            rng.uniform(-60, 70),
+            rng.uniform(-180, 180),
+            f"City {i % 500}",
+            rng.choice(countries),
+        ))
+    return rows
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    keep = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return size, keep
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rows = fake_rows(count)
+
+    # === Before: every game built its own list of airports from the DB rows ===
+    legacy_size, _ = measure(lambda: [
+        [LegacyAirport(str(r[0]), str(r[1]), float(r[2]), float(r[3]), str(r[4]), str(r[5])) for r in rows]
+        for _ in range(games)
+    ])
+
+    # === One copy of the rows: objects with a __dict__, __slots__ Airport records, columnar store ===
+    # (the catalog makes row views on demand, so the store is all it keeps)
+    legacy_one, _ = measure(lambda: [
+        LegacyAirport(str(r[0]), str(r[1]), float(r[2]), float(r[3]), str(r[4]), str(r[5])) for r in rows
+    ])
+    slots_one, _ = measure(lambda: [
+        Airport(str(r[0]), str(r[1]), float(r[2]), float(r[3]), str(r[4]), str(r[5])) for r in rows
+    ])
+    store_one, _ = measure(lambda: AirportStore(*zip(*rows)))
+
+    # === After: one compact catalog, each game only holds an AirportManager ===
+    catalog_size, catalog = measure(lambda: AirportCatalog(AirportStore(*zip(*rows))))
+    managers_size, _ = measure(lambda: [AirportManager(catalog) for _ in range(games)])
+
+    print(f"airports: {count}, games: {games}")
+    print(f"one copy of the rows: {legacy_one / 1024:.1f} KiB as objects, {slots_one / 1024:.1f} KiB as __slots__"
+          f" records, {store_one / 1024:.1f} KiB as store")
+    print(f"before: {legacy_size / 1024:10.1f} KiB total, {legacy_size / games / 1024:8.1f} KiB per game")
+    print(f"after:  {(catalog_size + managers_size) / 1024:10.1f} KiB total, {managers_size / games:8.1f} B per game"
+          f" (+ {catalog_size / 1024:.1f} KiB shared catalog incl. indexes)")
+
+
+if __name__ == "__main__":
+    main()
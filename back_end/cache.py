@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# === Thread-safe LRU cache with hit/miss counters ===
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # === Return the cached value or compute and store it ===
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def metrics(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+# === LRU cache whose entries expire ttl seconds after they are stored ===
+class TTLCache(LRUCache):
+    def __init__(self, ttl, maxsize=1024):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        entry = super().get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if time.monotonic() > expires_at:
+            with self._lock:
+                if self._data.get(key) is entry:
+                    del self._data[key]
+                self.hits -= 1
+                self.misses += 1
+            return default
+        return value
+
+    def set(self, key, value):
+        super().set(key, (value, time.monotonic() + self.ttl))
@@ -0,0 +1,150 @@
+# === Airport catalog snapshot: the airport and country tables in one file, loaded without MySQL ===
+# Run from back_end:
+#   python catalog_snapshot.py export [path]   write a snapshot from the DB
+#   python catalog_snapshot.py check [path]    compare a snapshot with the DB (exit code 1 if stale)
+#   python catalog_snapshot.py info [path]     show the snapshot header
+# Start the API from a snapshot with CATALOG_SNAPSHOT=path.
+#
+# File layout: 8-byte magic, 8-byte header length, JSON header (strings and metadata),
+# then lats and lngs as little-endian float64, 8-byte aligned so they can be memory-mapped.
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import numpy as np
+from airport import AirportStore, load_airports, load_country_names
+
+# ===  Constants ====
+CATALOG_SNAPSHOT = os.getenv('CATALOG_SNAPSHOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.snapshot'))
+
+MAGIC = b"LPCAT\x00\x01\x00"
+FORMAT_VERSION = 1
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+# === Checksum over every field and the country names, equal snapshots have equal checksums ===
+def content_checksum(store, country_names):
+    checksum = hashlib.sha1()
+    for column in (store.idents, store.names, store.cities, store.countries):
+        checksum.update(json.dumps(column, ensure_ascii=False).encode("utf-8"))
+    checksum.update(np.ascontiguousarray(store.lats, dtype="<f8").tobytes())
+    checksum.update(np.ascontiguousarray(store.lngs, dtype="<f8").tobytes())
+    checksum.update(json.dumps(sorted(country_names.items()), ensure_ascii=False).encode("utf-8"))
+    return checksum.hexdigest()
+
+
+def write_snapshot(path, store, country_names):
+    header = {
+        "format": FORMAT_VERSION,
+        "count": len(store),
+        "checksum": content_checksum(store, country_names),
+        "created_at": time.time(),
+        "idents": list(store.idents),
+        "names": list(store.names),
+        "cities": list(store.cities),
+        "countries": list(store.countries),
+        "country_names": country_names,
+    }
+    data = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    data += b" " * (-len(data) % 8)
+
+    # === Write to a temp file and rename, readers never see a half-written snapshot ===
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(data)))
+        f.write(data)
+        f.write(np.ascontiguousarray(store.lats, dtype="<f8").tobytes())
+        f.write(np.ascontiguousarray(store.lngs, dtype="<f8").tobytes())
+    os.replace(tmp_path, path)
+    return header
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError(f"{path} is not an airport catalog snapshot")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    if header.get("format") != FORMAT_VERSION:
+        raise SnapshotError(f"{path} has snapshot format {header.get('format')}, expected {FORMAT_VERSION}")
+    header["offset"] = len(MAGIC) + 8 + length
+    return header
+
+
+# === (AirportStore, country names, header); coordinates stay memory-mapped ===
+def read_snapshot(path, verify=True):
+    header = read_header(path)
+    count = header["count"]
+    coordinates = np.memmap(path, dtype="<f8", mode="r", offset=header["offset"], shape=(2, count))
+    store = AirportStore(header["idents"], header["names"], coordinates[0], coordinates[1],
+                         header["cities"], header["countries"])
+    if verify and content_checksum(store, header["country_names"]) != header["checksum"]:
+        raise SnapshotError(f"{path} is corrupt: checksum does not match its contents")
+    return store, header["country_names"], header
+
+
+def export_snapshot(path=CATALOG_SNAPSHOT):
+    return write_snapshot(path, load_airports(), load_country_names())
+
+
+# === (fresh, snapshot checksum, DB checksum) ===
+def check_snapshot(path=CATALOG_SNAPSHOT):
+    header = read_header(path)
+    db_checksum = content_checksum(load_airports(), load_country_names())
+    return header["checksum"] == db_checksum, header["checksum"], db_checksum
+
+
+# === Compare a snapshot-loaded catalog with the DB in the background, switch to the DB if stale ===
+def verify_in_background(path, on_stale):
+    def verify():
+        try:
+            fresh, _, _ = check_snapshot(path)
+        except Exception as e:
+            print(f"⚠️ Could not check catalog snapshot against the DB: {e}")
+            return
+        if not fresh:
+            print(f"⚠️ Catalog snapshot {path} is stale, reloading airports from the DB.")
+            on_stale()
+
+    thread = threading.Thread(target=verify, name="catalog-snapshot-check", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("export", "check", "info"):
+        print("Usage: python catalog_snapshot.py export|check|info [path]")
+        return 2
+    command = sys.argv[1]
+    path = sys.argv[2] if len(sys.argv) > 2 else CATALOG_SNAPSHOT
+
+    if command == "export":
+        started = time.perf_counter()
+        header = export_snapshot(path)
+        print(f"Wrote {header['count']} airports to {path} ({os.path.getsize(path) / 1024:.1f} KiB, "
+              f"{time.perf_counter() - started:.2f} s), checksum {header['checksum']}")
+        return 0
+
+    if command == "check":
+        fresh, snapshot_checksum, db_checksum = check_snapshot(path)
+        print(f"snapshot {snapshot_checksum}\nDB       {db_checksum}")
+        print("✅ Snapshot is up to date." if fresh else "❌ Snapshot is stale, run: python catalog_snapshot.py export")
+        return 0 if fresh else 1
+
+    started = time.perf_counter()
+    store, country_names, header = read_snapshot(path)
+    print(f"{path}: {header['count']} airports, {len(country_names)} countries, "
+          f"created {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(header['created_at']))}, "
+          f"checksum {header['checksum']}, read in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,239 @@
 import mysql.connector
+from mysql.connector import pooling
 import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from instrumentation import record_query
 
 load_dotenv()
 
 # ===  Constants ====
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+DB_SQLITE_PATH = os.getenv('DB_SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lentopeli.db'))
 DB_HOST = os.getenv('DB_HOST')
-DB_PORT = int(os.getenv('DB_PORT'))
+DB_PORT = int(os.getenv('DB_PORT', 3306))
 DB_LENTO_PELI = os.getenv('DB_LENTO_PELI')
 DB_USER = os.getenv('DB_USER')
 DB_PASSWORD = os.getenv('DB_PASSWORD')
 
-# ===  DB connection ====
-def get_connection():
-    return mysql.connector.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        database=DB_LENTO_PELI,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        autocommit=True
-    )
+# ===  Pool settings ====
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+
+
+class PoolTimeout(mysql.connector.errors.PoolError):
+    pass
+
+
+# === Auto-increment primary key column for CREATE TABLE ===
+AUTO_ID = "INTEGER PRIMARY KEY AUTOINCREMENT" if DB_BACKEND == 'sqlite' else "INT NOT NULL AUTO_INCREMENT PRIMARY KEY"
+
+
+# === SQLite stand-in for MySQL (tests, load tests): %s placeholders are translated ===
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    @staticmethod
+    def translate(sql):
+        return sql.replace("%s", "?")
+
+    def execute(self, sql, params=()):
+        return self._cursor.execute(self.translate(sql), params)
+
+    def executemany(self, sql, rows):
+        return self._cursor.executemany(self.translate(sql), rows)
+
+
+class SQLiteConnection:
+    def __init__(self, pool, path):
+        self._pool = pool
+        self._cnx = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    # === Same arguments as a MySQL cursor, dictionary=True is not supported ===
+    def cursor(self, *args, **kwargs):
+        return SQLiteCursor(self._cnx.cursor())
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self._pool.put(self)
+
+
+# === Same interface as MySQLConnectionPool, connections are opened on demand ===
+class SQLitePool:
+    def __init__(self, path=DB_SQLITE_PATH):
+        self.path = path
+        self._idle = queue.SimpleQueue()
+
+    def get_connection(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return SQLiteConnection(self, self.path)
+
+    def put(self, cnx):
+        self._idle.put(cnx)
+
+
+# === Cursor handed out by a pooled connection, counts and times statements ===
+class PooledCursor:
+    def __init__(self, cursor, pool):
+        self._cursor = cursor
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, params=()):
+        self._pool._count("queries")
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, rows):
+        self._pool._count("queries")
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, rows)
+        finally:
+            record_query(sql, time.perf_counter() - started)
+
+
+# === Connection handed out by the pool, close() gives it back ===
+class PooledConnection:
+    def __init__(self, cnx, pool):
+        self._cnx = cnx
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def cursor(self, *args, **kwargs):
+        return PooledCursor(self._cnx.cursor(*args, **kwargs), self._pool)
+
+    def close(self):
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool.release(cnx)
+
+
+# === Bounded pool with checkout timeout and metrics ===
+class ConnectionPool:
+    def __init__(self, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "queries": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "wait_seconds_total": 0.0,
+        }
+
+    def _backend_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None and DB_BACKEND == 'sqlite':
+                    self._pool = SQLitePool()
+                elif self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name="lentopeli",
+                        pool_size=self.size,
+                        host=DB_HOST,
+                        port=DB_PORT,
+                        database=DB_LENTO_PELI,
+                        user=DB_USER,
+                        password=DB_PASSWORD,
+                        autocommit=True
+                    )
+        return self._pool
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def get_connection(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            self._count("waits")
+            if not self._slots.acquire(timeout=timeout):
+                self._count("timeouts")
+                raise PoolTimeout(f"No DB connection available within {timeout}s (pool size {self.size})")
+        self._count("wait_seconds_total", time.monotonic() - started)
+
+        try:
+            # === Health check: the pool pings the connection and reconnects it if it went stale ===
+            cnx = self._backend_pool().get_connection()
+        except Exception:
+            self._count("errors")
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.stats["checkouts"] += 1
+            self.stats["in_use"] += 1
+            self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self.stats["in_use"])
+        return PooledConnection(cnx, self)
+
+    def release(self, cnx):
+        try:
+            cnx.close()
+        finally:
+            with self._lock:
+                self.stats["in_use"] -= 1
+            self._slots.release()
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+        data["size"] = self.size
+        data["available"] = self.size - data["in_use"]
+        data["timeout"] = self.timeout
+        data["backend"] = DB_BACKEND
+        return data
+
+
+pool = ConnectionPool()
+
+
+# ===  DB connection (from the pool, call close() when done) ====
+def get_connection(timeout=None):
+    return pool.get_connection(timeout)
+
+
+# ===  DB connection for a with-block ====
+@contextmanager
+def connection(timeout=None):
+    yhteys = get_connection(timeout)
+    try:
+        yield yhteys
+    finally:
+        yhteys.close()
+
+
+def pool_stats():
+    return pool.metrics()
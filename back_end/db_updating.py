@@ -1,38 +1,181 @@
-from db import get_connection
+from db import AUTO_ID, connection
+import atexit
+import os
+import queue
+import threading
+import time
 
-yhteys = get_connection()
+# ===  Results writer settings ====
+RESULTS_BATCH_SIZE = int(os.getenv('RESULTS_BATCH_SIZE', 50))
+RESULTS_QUEUE_SIZE = int(os.getenv('RESULTS_QUEUE_SIZE', 1000))
+RESULTS_FLUSH_INTERVAL = float(os.getenv('RESULTS_FLUSH_INTERVAL', 1.0))
+RESULTS_RETRIES = int(os.getenv('RESULTS_RETRIES', 3))
+
+INSERT_RESULT_SQL = """
+    INSERT INTO results (name, date, levels, cities, km_amount, co2_amount, status)
+    VALUES (%s, %s, %s, %s, %s, %s, %s);
+"""
 
 # === Database table creator ===
 def db_table_creator():
     sql = f"""
         CREATE TABLE IF NOT EXISTS results (
-            ID INT NOT NULL AUTO_INCREMENT,
+            ID {AUTO_ID},
             name VARCHAR(40),
             date VARCHAR(40),
             levels INT,
             cities INT,
             km_amount FLOAT,
             co2_amount FLOAT,
-            status VARCHAR(40),
-            PRIMARY KEY (ID)
+            status VARCHAR(40)
         );
     """
-    cursor = yhteys.cursor() 
-    cursor.execute(sql)
-    yhteys.commit()   
+    with connection() as yhteys:
+        cursor = yhteys.cursor()
+        cursor.execute(sql)
+        yhteys.commit()
     return
 
 # === Fill the database table 'results' ===
 def results_to_db(name, date, level, city, km, co2, status):
-    sql = f"""
-        INSERT INTO results (name, date, levels, cities, km_amount, co2_amount, status)
-        VALUES (%s, %s, %s, %s, %s, %s, %s);
-    """
     try:
-        cursor = yhteys.cursor()
-        cursor.execute(sql, (name, date, level, city, km, co2, status))
-        yhteys.commit()
+        with connection() as yhteys:
+            cursor = yhteys.cursor()
+            cursor.execute(INSERT_RESULT_SQL, (name, date, level, city, km, co2, status))
+            yhteys.commit()
         return True
     except Exception as e:
         print("Mistake:", e)
         return False
+
+# === Insert many result rows in one round trip, raises on failure ===
+def results_many_to_db(rows):
+    with connection() as yhteys:
+        cursor = yhteys.cursor()
+        cursor.executemany(INSERT_RESULT_SQL, rows)
+        yhteys.commit()
+
+
+_STOP = object()
+
+
+# === Background results sink: bounded queue, batched inserts, retry, flush on shutdown ===
+class ResultsWriter:
+    def __init__(self, batch_size=RESULTS_BATCH_SIZE, max_queue=RESULTS_QUEUE_SIZE,
+                 flush_interval=RESULTS_FLUSH_INTERVAL, retries=RESULTS_RETRIES):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "batches": 0,
+            "retries": 0,
+            "failed": 0,
+            "sync_writes": 0,
+        }
+
+    # === Create the table once and start the writer thread ===
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._ensure_schema()
+            self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _ensure_schema(self):
+        if self._schema_ready:
+            return
+        try:
+            db_table_creator()
+            self._schema_ready = True
+        except Exception as e:
+            print("Mistake:", e)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    # === Queue one game result, written by the background thread ===
+    def submit(self, name, date, level, city, km, co2, status):
+        self.start()
+        row = (name, date, level, city, km, co2, status)
+        try:
+            self.queue.put_nowait(row)
+            self._count("queued")
+        except queue.Full:
+            # === Buffer is full: write this one directly instead of dropping it ===
+            self._count("sync_writes")
+            self._write([row])
+
+    def _run(self):
+        while True:
+            batch = []
+            stop = False
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            while True:
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + stop):
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _write(self, rows):
+        for attempt in range(self.retries + 1):
+            try:
+                self._ensure_schema()
+                results_many_to_db(rows)
+                self._count("written", len(rows))
+                self._count("batches")
+                return True
+            except Exception as e:
+                print("Mistake:", e)
+                if attempt < self.retries:
+                    self._count("retries")
+                    time.sleep(min(0.5 * 2 ** attempt, 5))
+        self._count("failed", len(rows))
+        return False
+
+    # === Block until everything queued so far is written (or failed) ===
+    def flush(self):
+        if self._thread is not None:
+            self.queue.join()
+
+    # === Flush remaining rows and stop the thread ===
+    def stop(self, timeout=10):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self.queue.put(_STOP)
+        thread.join(timeout)
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+        data["pending"] = self.queue.qsize()
+        return data
+
+
+results_writer = ResultsWriter()
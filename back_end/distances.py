@@ -0,0 +1,133 @@
+import os
+import numpy as np
+from geopy import distance
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ===  Constants ====
+# haversine = sphere, ellipsoid = Andoyer-Lambert (~10 m), geodesic = geopy (exact, slow to build)
+DISTANCE_MODE = os.getenv('DISTANCE_MODE', 'ellipsoid')
+DISTANCE_CACHE_DIR = os.getenv('DISTANCE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+EARTH_RADIUS_KM = 6371.0088
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+# === Rows computed per block while building the matrix ===
+BLOCK_ROWS = 256
+
+
+# === Great-circle distance on a sphere, works on scalars and numpy arrays ===
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+# === Andoyer-Lambert approximation of the WGS84 geodesic, vectorized ===
+def ellipsoid_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+
+    h = np.sin((beta2 - beta1) / 2) ** 2 + np.cos(beta1) * np.cos(beta2) * np.sin((lng2 - lng1) / 2) ** 2
+    sigma = 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        result = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+    return np.where(sigma > 1e-12, result, 0.0)
+
+
+# === Exact geodesic through geopy, one pair at a time ===
+def geodesic_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = np.broadcast_arrays(*map(np.asarray, (lat1, lng1, lat2, lng2)))
+    result = np.empty(lat1.shape)
+    for index in np.ndindex(lat1.shape):
+        result[index] = distance.distance((lat1[index], lng1[index]), (lat2[index], lng2[index])).kilometers
+    return result
+
+
+DISTANCE_FUNCTIONS = {
+    'haversine': haversine_km,
+    'ellipsoid': ellipsoid_km,
+    'geodesic': geodesic_km,
+}
+
+
+def distance_function(mode=None):
+    mode = mode or DISTANCE_MODE
+    if mode not in DISTANCE_FUNCTIONS:
+        raise ValueError(f"Unknown distance mode '{mode}', use one of {', '.join(DISTANCE_FUNCTIONS)}")
+    return DISTANCE_FUNCTIONS[mode]
+
+
+# === Distance between two points in km with the configured mode ===
+def point_distance(lat1, lng1, lat2, lng2, mode=None):
+    return float(distance_function(mode)(lat1, lng1, lat2, lng2))
+
+
+# === All-pairs distance matrix, cached on disk as .npy and memory-mapped ===
+class DistanceMatrix:
+    def __init__(self, lats, lngs, mode=None, cache_key=None, cache_dir=None):
+        self.mode = mode or DISTANCE_MODE
+        self.function = distance_function(self.mode)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.path = None
+        if cache_key:
+            self.path = os.path.join(cache_dir or DISTANCE_CACHE_DIR, f"distances_{self.mode}_{cache_key}.npy")
+        self.matrix = self._load_or_build()
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _load_or_build(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                matrix = np.load(self.path, mmap_mode='r')
+                if matrix.shape == (len(self), len(self)):
+                    return matrix
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Distance cache {self.path} unreadable, rebuilding: {e}")
+
+        matrix = self.build()
+        if not self.path:
+            return matrix
+
+        # === Write to a temp file first so other workers never see a half-written matrix ===
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, matrix)
+            os.replace(tmp_path, self.path)
+            return np.load(self.path, mmap_mode='r')
+        except OSError as e:
+            print(f"⚠️ Could not write distance cache {self.path}: {e}")
+            return matrix
+
+    def build(self):
+        n = len(self)
+        matrix = np.zeros((n, n), dtype=np.float32)
+        for start in range(0, n, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, n)
+            matrix[start:stop] = self.function(
+                self.lats[start:stop, None], self.lngs[start:stop, None],
+                self.lats[None, :], self.lngs[None, :]
+            )
+        return matrix
+
+    def distance(self, i, j):
+        return float(self.matrix[i, j])
+
+    def route_distance(self, positions):
+        if len(positions) < 2:
+            return 0.0
+        positions = np.asarray(positions)
+        return float(self.matrix[positions[:-1], positions[1:]].sum(dtype=np.float64))
+
@@ -1,15 +1,13 @@
 from airport import AirportManager
 from stage import Stage
 from tips_countries import tips_countries
-from db_updating import db_table_creator, results_to_db
+from db_updating import results_writer
 from datetime import datetime
-from db import get_connection
 import copy
 
 class Game:
     def __init__(self, player_name):
         self.player_name = player_name
-        self.yhteys = get_connection()
         self.airport_manager = AirportManager()
 
         self.session = {
@@ -28,11 +26,22 @@ class Game:
             "flight_history": []
         }
 
+        self.results_saved = False
+
+    # === Compact, JSON-serializable game state for the session store ===
+    def to_state(self):
+        return {"session": self.session, "total": self.total, "results_saved": self.results_saved}
+
+    @classmethod
+    def from_state(cls, player_name, state):
+        game = cls(player_name)
+        game.session = state["session"]
+        game.total = state["total"]
+        game.results_saved = state.get("results_saved", False)
+        return game
+
     def get_country_name(self, code):
-        for c, name in self.airport_manager.show_countries() or []:
-            if c.upper() == code.upper():
-                return name
-        return code.upper()
+        return self.airport_manager.get_country_name(code)
 
     def stage_guess_country(self, country_code):
         if not country_code:
@@ -207,18 +216,24 @@ class Game:
         print(f"Total distance: {self.total['total_distance']:.1f} km")
         print(f"Total CO2: {self.total['total_co2']:.2f} kg")
 
-        db_table_creator()
+        self.save_results()
+
+        print("✅ Results saved to database.")
+        print("See you next time!")
+
+    # === Queue the final results once per game ===
+    def save_results(self):
+        if self.results_saved:
+            return
         date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        results_to_db(
+        results_writer.submit(
             self.player_name,
             date,
             self.session["current_stage"],
             len(self.total["flight_history"]),
             self.total["total_distance"],
             self.total["total_co2"],
-            self.session["game_status"],
+            self.session["game_status"] or "Quit",
         )
-
-        print("✅ Results saved to database.")
-        print("See you next time!")
\ No newline at end of file
+        self.results_saved = True
\ No newline at end of file
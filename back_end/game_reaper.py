@@ -0,0 +1,83 @@
+import os
+import threading
+from game import Game
+
+# ===  Constants ====
+REAPER_INTERVAL = float(os.getenv('REAPER_INTERVAL', 60))
+# === Finished games stay readable (GET /api/result) this long before they are removed ===
+FINISHED_GAME_TTL = int(os.getenv('FINISHED_GAME_TTL', 10 * 60))
+
+
+# === Removes idle and finished games from the session store and saves their results ===
+class GameReaper:
+    def __init__(self, store, interval=REAPER_INTERVAL, finished_ttl=FINISHED_GAME_TTL):
+        self.store = store
+        self.interval = interval
+        self.finished_ttl = finished_ttl
+        self.store.on_evict = self._evicted
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {
+            "started": 0,
+            "finished": 0,
+            "evicted_idle": 0,
+            "evicted_lru": 0,
+            "replaced": 0,
+            "removed_finished": 0,
+            "results_saved": 0,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="game-reaper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.store.purge_expired()
+            except Exception as e:
+                print("Mistake:", e)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _save_results(self, game):
+        if not game.results_saved:
+            game.save_results()
+            self._count("results_saved")
+
+    # === Called by the store for every game it drops ===
+    def _evicted(self, player_name, state, reason):
+        if state and state.get("results_saved"):
+            self._count("removed_finished")
+            return
+        self._count(f"evicted_{reason}")
+        if state:
+            self._save_results(Game.from_state(player_name, state))
+
+    # === New game for a player: an unfinished previous game is saved first ===
+    def started(self, game, previous=None):
+        self._count("started")
+        if previous is not None and not previous.results_saved:
+            self._count("replaced")
+            self._save_results(previous)
+
+    # === Game over (win, lose or quit): save results now, keep state briefly for the result screen ===
+    def finish(self, game):
+        self._count("finished")
+        self._save_results(game)
+        self.store.set(game.player_name, game.to_state(), ttl=self.finished_ttl)
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+        data["live"] = len(self.store)
+        return data
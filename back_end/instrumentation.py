@@ -0,0 +1,223 @@
+# === Timing and counters for the hot paths, exported at /metrics in Prometheus text format ===
+# Per request: DB queries, distance lookups and timed functions, optionally sent back as a
+# Server-Timing header (SERVER_TIMING=1) so they show up in the browser's network panel.
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# ===  Constants ====
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 1000)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    # === values[labels] = [count per bucket (+Inf last), sum, count] ===
+    def observe(self, value, *label_values):
+        with self._lock:
+            entry = self.values.get(label_values)
+            if entry is None:
+                entry = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    labels = format_labels(self.labels + ("le",), label_values + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+http_requests = Counter("lentopeli_http_requests_total", "HTTP requests.", ("method", "endpoint", "status"))
+http_seconds = Histogram("lentopeli_http_request_seconds", "HTTP request duration.", ("endpoint",))
+db_queries = Counter("lentopeli_db_queries_total", "SQL statements executed.", ("statement",))
+db_seconds = Histogram("lentopeli_db_query_seconds", "SQL statement duration.", ("statement",))
+db_queries_per_request = Histogram("lentopeli_db_queries_per_request", "SQL statements per HTTP request.",
+                                   buckets=COUNT_BUCKETS)
+function_seconds = Histogram("lentopeli_function_seconds", "Duration of instrumented functions.", ("function",))
+distance_calls = Counter("lentopeli_distance_calls_total",
+                         "Distance lookups: matrix = precomputed, point = computed on the fly.", ("kind",))
+distance_calls_per_request = Histogram("lentopeli_distance_calls_per_request", "Distance lookups per HTTP request.",
+                                       buckets=COUNT_BUCKETS)
+
+METRICS = (http_requests, http_seconds, db_queries, db_seconds, db_queries_per_request,
+           function_seconds, distance_calls, distance_calls_per_request)
+
+
+# === What one HTTP request spent its time on ===
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.distance_calls = 0
+        self.functions = {}
+
+    def server_timing(self, total_seconds):
+        parts = [f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries"']
+        for name, seconds in self.functions.items():
+            parts.append(f"{name};dur={seconds * 1000:.1f}")
+        parts.append(f'dist;desc="{self.distance_calls} distance lookups"')
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("lentopeli_request_stats", default=None)
+
+
+def current_request():
+    return _current.get()
+
+
+def start_request():
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+
+# === Record a finished request in the HTTP metrics, returns its duration in seconds ===
+def finish_request(stats, method, endpoint, status):
+    seconds = time.perf_counter() - stats.started
+    http_requests.inc(method, endpoint, status)
+    http_seconds.observe(seconds, endpoint)
+    db_queries_per_request.observe(stats.queries)
+    distance_calls_per_request.observe(stats.distance_calls)
+    return seconds
+
+
+def record_query(sql, seconds):
+    statement = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "UNKNOWN"
+    db_queries.inc(statement)
+    db_seconds.observe(seconds, statement)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += seconds
+
+
+def record_distance(kind="matrix", count=1):
+    distance_calls.inc(kind, amount=count)
+    stats = _current.get()
+    if stats is not None:
+        stats.distance_calls += count
+
+
+def record_function(name, seconds):
+    function_seconds.observe(seconds, name)
+    stats = _current.get()
+    if stats is not None:
+        stats.functions[name] = stats.functions.get(name, 0.0) + seconds
+
+
+# === Decorator: time every call, per function and (inside a request) for Server-Timing ===
+# Works on plain and async functions.
+def timed(name):
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    record_function(name, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_function(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# === Flask hooks: per-request stats, request metrics, Server-Timing and GET /metrics ===
+def init_app(app, server_timing=SERVER_TIMING):
+    from flask import Response, request
+
+    @app.before_request
+    def start_request_stats():
+        start_request()
+
+    @app.after_request
+    def record_request_stats(response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        seconds = finish_request(stats, request.method, request.endpoint or "unknown", response.status_code)
+        if server_timing:
+            response.headers["Server-Timing"] = stats.server_timing(seconds)
+        return response
+
+    # --- Worker threads are reused, do not leak stats into the next request ---
+    @app.teardown_request
+    def end_request_stats(exc):
+        _current.set(None)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+    return app
@@ -2,22 +2,62 @@ import logging
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 import requests 
-from airport import AirportManager
+from airport import AirportManager, get_catalog, route_cache
+from airport_payloads import airports_payload
 from game import Game
 from stage import Stage
 from tips_countries import tips_countries
 import os
+from db import pool_stats
+from db_updating import results_writer
+from session_store import create_session_store
+from game_reaper import GameReaper
+from route_executor import route_executor
+from weather import WeatherError, weather_service
+import instrumentation
 
-active_games = {}
+AIRPORTS_MAX_AGE = int(os.getenv("AIRPORTS_MAX_AGE", 300))
+MAX_LAYOVER_STOPS = int(os.getenv("MAX_LAYOVER_STOPS", 5))
+ROUTES_MAX_AGE = int(os.getenv("ROUTES_MAX_AGE", 3600))
+MAX_WEATHER_BATCH = int(os.getenv("MAX_WEATHER_BATCH", 20))
+MAX_QUOTE_AIRPORTS = int(os.getenv("MAX_QUOTE_AIRPORTS", 30))
+
+# --- Game state per player, shared by all workers when the backend is sqlite/redis ---
+session_store = create_session_store()
+reaper = GameReaper(session_store)
 
 def create_app():
     app = Flask(__name__)
 
+    # --- Airport catalog is loaded once and shared with every game ---
+    get_catalog()
     airport_manager = AirportManager()
 
+    # --- Results table is created once, results are written in the background ---
+    results_writer.start()
+
+    # --- Idle games are evicted in the background, their results are saved ---
+    reaper.start()
+
+    # --- Game state is loaded from and saved to the session store on every request ---
+    def load_game(player_name):
+        state = session_store.get(player_name) if player_name else None
+        return Game.from_state(player_name, state) if state else None
+
+    # --- Weather for the stage airports (and route stops) is fetched in the background ---
+    def prefetch_weather(idents):
+        airports = [airport_manager.find_airport(ident) for ident in idents]
+        weather_service.prefetch([a for a in airports if a])
+
+    def save_game(game):
+        session_store.set(game.player_name, game.to_state())
+
     # --- Headers ---
     CORS(app) 
 
+    # --- Request timing, query counts and GET /metrics (Server-Timing header with SERVER_TIMING=1) ---
+    instrumentation.init_app(app)
+
     # --- Logging ---
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
@@ -43,13 +83,20 @@ def create_app():
                 "GET /api/game/state/<player_name>": "Get current game state",
                 "POST /api/game/guess": "Submit country guess",
                 "POST /api/game/select-airport": "Select airport and calculate route",
+                "POST /api/game/quote-routes": "Quote routes to several airports for every stop count",
                 "POST /api/game/confirm-flight": "Confirm flight and update game state",
                 "POST /api/game/replay-stage": "Replay current stage",
                 "POST /api/game/end-lose": "End game with lose status",
                 "POST /api/game/quit": "Quit the current game",
-                "GET /api/airports": "Returns all airports",
-                "GET /api/layover_route/<origin_code>/<dest_code>": "Return intermediate airport stops",
+                "GET /api/airports": "Returns all airports (?format=compact for column arrays)",
+                "GET /api/layover_route/<origin_code>/<dest_code>?stops=N": "Return routes with 0..N intermediate airport stops",
                 "GET /api/result/<player_name>": "Return game result",
+                "GET /api/weather/<icao>": "Current weather at an airport",
+                "GET /api/weather?icao=A,B,C": "Current weather at several airports",
+                "GET /api/db/pool": "DB connection pool metrics",
+                "GET /api/games/stats": "Live and evicted game counters",
+                "GET /api/routes/stats": "Route cache and route worker counters",
+                "GET /metrics": "Request, query and hot-path timings in Prometheus format",
             }
         }), 200
     
@@ -63,12 +110,15 @@ def create_app():
             data = request.json
             player_name = data.get("player_name", "Player")
             
+            previous = load_game(player_name)
             game = Game(player_name)
-            active_games[player_name] = game
             
             game.session["current_stage"] = 0
             stage = Stage(1)
             stage.task_criteria(game.session, game.airport_manager)
+            prefetch_weather([game.session["origin"], *game.session["places"].values()])
+            save_game(game)
+            reaper.started(game, previous)
             
             countries_to_visit = list(game.session["places"].keys())
             tips = [tips_countries.get(c, "No clue.") for c in countries_to_visit]
@@ -94,10 +144,10 @@ def create_app():
     def get_game_state(player_name):
         """Get current game state"""
         try:
-            if player_name not in active_games:
+            game = load_game(player_name)
+            if not game:
                 return jsonify({"error": "Game not found"}), 404
             
-            game = active_games[player_name]
             countries_to_visit = list(game.session["places"].keys())
             
             return jsonify({
@@ -126,10 +176,10 @@ def create_app():
             player_name = data.get("player_name")
             guess = data.get("guess", "").strip().upper()
             
-            if player_name not in active_games:
+            game = load_game(player_name)
+            if not game:
                 return jsonify({"error": "Game not found"}), 404
             
-            game = active_games[player_name]
             countries_to_visit = list(game.session["places"].keys())
             
             if guess in countries_to_visit:
@@ -178,10 +228,11 @@ def create_app():
             country_code = data.get("country_code")
             stops = data.get("stops", 0)
             
-            if player_name not in active_games:
+            game = load_game(player_name)
+            if not game:
                 return jsonify({"error": "Game not found"}), 404
-            
-            game = active_games[player_name]
+            if not isinstance(stops, int) or not 0 <= stops <= MAX_LAYOVER_STOPS:
+                return jsonify({"error": f"stops must be between 0 and {MAX_LAYOVER_STOPS}"}), 400
             
             # Find airports
             origin = game.airport_manager.find_airport(game.session["origin"])
@@ -190,10 +241,11 @@ def create_app():
             if not origin or not dest:
                 return jsonify({"error": "Airport not found"}), 404
             
-            route = game.airport_manager.find_route_with_stops(origin, dest, stops)
+            route = game.airport_manager.find_route_cached(origin, dest, stops)
             
             if not route:
                 return jsonify({"error": "Could not find valid route"}), 400
+            prefetch_weather([a.ident for a in route[1:-1]])
             
             stage = Stage(game.session["current_stage"])
             dist = game.airport_manager.total_route_distance(route)
@@ -223,6 +275,78 @@ def create_app():
             logger.error(f"Error calculating route: {e}")
             return jsonify({"error": str(e)}), 500
 
+    # -----------------------------
+    # Quote routes - POST /api/game/quote-routes
+    # -----------------------------
+    @app.route("/api/game/quote-routes", methods=["POST"])
+    def quote_routes():
+        """Quote route, distance and CO2 for each airport and stop count"""
+        try:
+            data = request.json
+            player_name = data.get("player_name")
+            country_code = data.get("country_code")
+            airport_codes = data.get("airport_codes")
+            max_stops = data.get("max_stops", 2)
+
+            game = load_game(player_name)
+            if not game:
+                return jsonify({"error": "Game not found"}), 404
+            if not isinstance(max_stops, int) or not 0 <= max_stops <= MAX_LAYOVER_STOPS:
+                return jsonify({"error": f"max_stops must be between 0 and {MAX_LAYOVER_STOPS}"}), 400
+
+            manager = game.airport_manager
+
+            origin = manager.find_airport(game.session["origin"])
+            if airport_codes:
+                if not isinstance(airport_codes, list) or len(airport_codes) > MAX_QUOTE_AIRPORTS:
+                    return jsonify({"error": f"airport_codes must be a list of at most {MAX_QUOTE_AIRPORTS} codes"}), 400
+                dests = [manager.find_airport(code) for code in airport_codes]
+            else:
+                dests = manager.get_airports_by_country(country_code)
+
+            if not origin or not dests or None in dests:
+                return jsonify({"error": "Airport not found"}), 404
+            if len(dests) > MAX_QUOTE_AIRPORTS:
+                return jsonify({"error": f"At most {MAX_QUOTE_AIRPORTS} airports per request"}), 400
+
+            stage = Stage(game.session["current_stage"])
+            co2_available = game.session["co2_available"]
+            quotes = manager.quote_routes(origin, dests, max_stops)
+
+            airports_data = []
+            for dest in dests:
+                options = []
+                for stops, route in enumerate(quotes[dest.ident]):
+                    if not route:
+                        options.append({"stops": stops, "available": False})
+                        continue
+                    dist = manager.total_route_distance(route)
+                    co2 = stage.calc_co2_emmission(dist)
+                    options.append({
+                        "stops": stops,
+                        "available": True,
+                        "route": [a.ident for a in route],
+                        "distance": round(dist, 1),
+                        "co2_required": round(co2, 2),
+                        "enough_co2": co2 <= co2_available
+                    })
+                airports_data.append({
+                    "ident": dest.ident,
+                    "name": dest.name,
+                    "city": dest.city,
+                    "options": options
+                })
+
+            return jsonify({
+                "origin": origin.ident,
+                "co2_available": round(co2_available, 2),
+                "airports": airports_data
+            }), 200
+
+        except Exception as e:
+            logger.error(f"Error quoting routes: {e}")
+            return jsonify({"error": str(e)}), 500
+
     # -----------------------------
     # Confirm flight - POST /api/game/confirm-flight
     # -----------------------------
@@ -237,11 +361,10 @@ def create_app():
             distance = data.get("distance")
             co2 = data.get("co2")
             
-            if player_name not in active_games:
+            game = load_game(player_name)
+            if not game:
                 return jsonify({"error": "Game not found"}), 404
             
-            game = active_games[player_name]
-            
             if co2 > game.session["co2_available"]:
                 return jsonify({
                     "error": "not_enough_co2",
@@ -271,6 +394,7 @@ def create_app():
             if stage_complete:
                 if game.session["current_stage"] >= 5:
                     game.session["game_status"] = "Win"
+                    reaper.finish(game)
                     return jsonify({
                         "stage_complete": True,
                         "game_complete": True,
@@ -282,6 +406,8 @@ def create_app():
                     
                     stage = Stage(next_stage_number)
                     stage.task_criteria(game.session, game.airport_manager)
+                    prefetch_weather([game.session["origin"], *game.session["places"].values()])
+                    save_game(game)
                     
                     countries_to_visit = list(game.session["places"].keys())
                     tips = [tips_countries.get(c, "No clue.") for c in countries_to_visit]
@@ -295,6 +421,7 @@ def create_app():
                         "tips": tips
                     }), 200
             else:
+                save_game(game)
                 tips = [tips_countries.get(c, "No clue.") for c in countries_remaining]
                 return jsonify({
                     "stage_complete": False,
@@ -319,11 +446,10 @@ def create_app():
             backup_session = data.get("backup_session")
             backup_total = data.get("backup_total")
             
-            if player_name not in active_games:
+            game = load_game(player_name)
+            if not game:
                 return jsonify({"error": "Game not found"}), 404
             
-            game = active_games[player_name]
-            
             if backup_session and backup_total:
                 game.session = backup_session
                 game.total = backup_total
@@ -335,6 +461,8 @@ def create_app():
             stage = Stage(current_stage_num)
             game.session["current_stage"] = current_stage_num - 1
             stage.task_criteria(game.session, game.airport_manager)
+            prefetch_weather([game.session["origin"], *game.session["places"].values()])
+            save_game(game)
 
             countries_to_visit = list(game.session["places"].keys())
             tips = [tips_countries.get(c, "No clue.") for c in countries_to_visit]
@@ -362,13 +490,13 @@ def create_app():
             data = request.json
             player_name = data.get("player_name")
             
-            if player_name not in active_games:
+            game = load_game(player_name)
+            if not game:
                 return jsonify({"error": "Game not found"}), 404
             
-            game = active_games[player_name]
-            
             game.session["current_stage"] -= 1
             game.session["game_status"] = "Lose"
+            reaper.finish(game)
             
             return jsonify({
                 "game_ended": True,
@@ -389,13 +517,13 @@ def create_app():
             data = request.json
             player_name = data.get("player_name")
 
-            if player_name not in active_games:
+            game = load_game(player_name)
+            if not game:
                 return jsonify({"error": "Game not found"}), 404
-
-            game = active_games[player_name]
-
+            
             if not game.session.get("game_status"):
                 game.session["game_status"] = "Quit"
+            reaper.finish(game)
 
             return jsonify({
                 "game_ended": True,
@@ -411,24 +539,81 @@ def create_app():
     # -----------------------------
     @app.route("/api/airports", methods=["GET"])
     def get_airports():
-        """Returns a list of all airports with their basic information."""
+        """Returns all airports as pre-encoded JSON (?format=compact for column arrays)."""
         try:
-            data = [
-                {
-                    "ident": i.ident,
-                    "name": i.name,
-                    "lat": i.lat,
-                    "lng": i.lng,
-                    "city": i.city,
-                    "country": i.country
-                }
-                for i in airport_manager.all_airports
-            ]
-            return jsonify(data), 200
+            compact = request.args.get("format") == "compact"
+            payload = airports_payload(airport_manager.catalog, compact)
+            encoding, body, etag = payload.select(request.headers.get("Accept-Encoding"))
+
+            if request.if_none_match.contains_weak(etag.strip('"')):
+                response = app.response_class(status=304)
+            else:
+                response = app.response_class(body, status=200, mimetype="application/json")
+                if encoding != "identity":
+                    response.headers["Content-Encoding"] = encoding
+
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = f"public, max-age={AIRPORTS_MAX_AGE}"
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
         except Exception as e:
             logger.error(f"Error fetching airports: {e}")
             return jsonify({"error": "Failed to fetch airports"}), 500
     
+    # -----------------------------
+    # GET Layover route - /api/layover_route/<origin_code>/<dest_code>
+    # -----------------------------
+    @app.route("/api/layover_route/<origin_code>/<dest_code>", methods=["GET"])
+    def get_layover_route(origin_code, dest_code):
+        """Returns the best route for every stop count from 0 to ?stops=N."""
+        try:
+            try:
+                stops = int(request.args.get("stops", 2))
+            except ValueError:
+                return jsonify({"error": "stops must be a number"}), 400
+            if not 0 <= stops <= MAX_LAYOVER_STOPS:
+                return jsonify({"error": f"stops must be between 0 and {MAX_LAYOVER_STOPS}"}), 400
+
+            origin = airport_manager.find_airport(origin_code)
+            dest = airport_manager.find_airport(dest_code)
+            if not origin or not dest:
+                return jsonify({"error": "Airport not found"}), 404
+
+            stage = Stage(0)
+            options = []
+            for num_stops, route in enumerate(airport_manager.route_options(origin, dest, stops)):
+                if not route:
+                    options.append({"stops": num_stops, "available": False})
+                    continue
+                dist = airport_manager.total_route_distance(route)
+                options.append({
+                    "stops": num_stops,
+                    "available": True,
+                    "route": [
+                        {
+                            "ident": a.ident,
+                            "name": a.name,
+                            "lat": a.lat,
+                            "lng": a.lng,
+                            "type": "START" if i == 0 else ("END" if i == len(route)-1 else "STOP")
+                        }
+                        for i, a in enumerate(route)
+                    ],
+                    "distance": round(dist, 1),
+                    "co2": round(stage.calc_co2_emmission(dist), 2)
+                })
+
+            response = jsonify({
+                "origin": origin.ident,
+                "destination": dest.ident,
+                "options": options
+            })
+            response.headers["Cache-Control"] = f"public, max-age={ROUTES_MAX_AGE}"
+            return response, 200
+        except Exception as e:
+            logger.error(f"Error calculating layover route: {e}")
+            return jsonify({"error": "Failed to calculate route"}), 500
+
     # -----------------------------
     # GET Result - /api/result/<player_name>
     # -----------------------------
@@ -436,11 +621,10 @@ def create_app():
     def get_results(player_name):
         """Retrieve the current game results for a player."""
         try:
-            if player_name not in active_games:
+            game = load_game(player_name)
+            if not game:
                 return jsonify({"error": "Game not found"}), 404
             
-            game = active_games[player_name]
-            
             data = {
                 "player_name": player_name,
                 "levels_achieved": game.session["current_stage"],
@@ -466,26 +650,63 @@ def create_app():
         if not airport:
             return jsonify({"error": "Airport not found"}), 404
         
-        lat, lon = airport.lat, airport.lng
-
-        API_KEY = os.getenv("OPENWEATHER_API_KEY")
-        weather_url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}"
         try:
-            result = requests.get(weather_url)
-            if result.status_code == 200:
-                json_result = result.json()
-                return jsonify({
-                    "weather": json_result["weather"][0]["main"],
-                    "wind": json_result["wind"]["speed"],
-                    "description": json_result["weather"][0]["description"],
-                    "temperature": round(json_result["main"]["temp"] - 273.15),
-                    "icon": f"http://openweathermap.org/img/wn/{json_result['weather'][0]['icon']}@2x.png"
-                })
-            else:
-                return jsonify({"error": "Failed to fetch weather"}), result.status_code
+            return jsonify(weather_service.for_airport(airport))
+        except WeatherError as e:
+            return jsonify({"error": "Failed to fetch weather"}), e.status_code
         except requests.exceptions.RequestException as e:
             return jsonify({"error": "Search failed"}), 500
 
+    # -----------------------------
+    # Weather for several airports - GET /api/weather?icao=EFHK,ESSA
+    # -----------------------------
+    @app.route("/api/weather", methods=["GET"])
+    def get_weather_batch():
+        """Returns weather per ICAO code, fetched concurrently"""
+        codes = [code.strip().upper() for code in request.args.get("icao", "").split(",") if code.strip()]
+        if not codes:
+            return jsonify({"error": "icao parameter is required"}), 400
+        if len(codes) > MAX_WEATHER_BATCH:
+            return jsonify({"error": f"At most {MAX_WEATHER_BATCH} airports per request"}), 400
+
+        airports = {code: airport_manager.find_airport(code) for code in codes}
+        results = weather_service.for_airports([a for a in airports.values() if a])
+
+        weather = {}
+        for code, airport in airports.items():
+            result = results.get(airport.ident) if airport else None
+            if not airport:
+                weather[code] = {"error": "Airport not found"}
+            elif isinstance(result, Exception):
+                weather[code] = {"error": "Failed to fetch weather"}
+            else:
+                weather[code] = result
+        return jsonify({"weather": weather}), 200
+
+    # -----------------------------
+    # DB pool metrics - GET /api/db/pool
+    # -----------------------------
+    @app.route("/api/db/pool", methods=["GET"])
+    def get_pool_stats():
+        """Returns connection pool usage for sizing DB_POOL_SIZE."""
+        return jsonify(pool_stats()), 200
+
+    # -----------------------------
+    # Game counters - GET /api/games/stats
+    # -----------------------------
+    @app.route("/api/games/stats", methods=["GET"])
+    def get_game_stats():
+        """Returns live, finished and evicted game counters."""
+        return jsonify(reaper.metrics()), 200
+
+    # -----------------------------
+    # Route counters - GET /api/routes/stats
+    # -----------------------------
+    @app.route("/api/routes/stats", methods=["GET"])
+    def get_route_stats():
+        """Returns route cache and route worker counters."""
+        return jsonify({"cache": route_cache.metrics(), "executor": route_executor.metrics()}), 200
+
     # -----------------------------
     # Error handling
     # -----------------------------
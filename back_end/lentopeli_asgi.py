@@ -0,0 +1,161 @@
+# === ASGI serving mode ===
+# Run from back_end:  uvicorn lentopeli_asgi:app --port 5000
+# Needs: pip install httpx uvicorn a2wsgi==1.10.10
+#
+# Weather is served by a native async route (the weather provider's fetch_async), so slow
+# upstream calls only hold a coroutine. Every other route is the Flask app from lentopeli_api,
+# run by a2wsgi in a thread pool so DB queries and route searches never block the event loop.
+import asyncio
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+from a2wsgi import WSGIMiddleware
+
+import instrumentation
+from airport import AirportManager
+from instrumentation import timed
+from lentopeli_api import create_app
+from weather import WEATHER_POOL_SIZE, WeatherError, weather_service
+
+# ===  Constants ====
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 32))
+
+WEATHER_PATH = re.compile(r"/api/weather/([^/]+)")
+
+# --- httpx logs every request at INFO ---
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+# === Async weather: same provider, cache and rate limit as the sync service, single-flight per ICAO ===
+# Providers without fetch_async (stubs, other APIs) run their blocking fetch on a small thread pool.
+class AsyncWeatherService:
+    def __init__(self, service=weather_service, workers=WEATHER_POOL_SIZE):
+        self.service = service
+        self.workers = workers
+        self._executor = None
+        self._flights = {}
+
+    async def _upstream(self, airport):
+        provider = self.service.provider
+        if hasattr(provider, "fetch_async"):
+            return await provider.fetch_async(airport.lat, airport.lng)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="weather-async")
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, provider.fetch, airport.lat, airport.lng
+        )
+
+    async def _fetch(self, airport):
+        if not await self.service.limiter.acquire_async():
+            self.service.count("rate_limited")
+            raise WeatherError(429)
+        self.service.count("upstream_calls")
+        weather = await self._upstream(airport)
+        self.service.cache.set(airport.ident, weather)
+        return weather
+
+    @timed("get_weather")
+    async def for_airport(self, airport):
+        weather = self.service.cache.get(airport.ident)
+        if weather is not None:
+            return weather
+
+        flight = self._flights.get(airport.ident)
+        if flight is not None:
+            self.service.count("coalesced")
+            return await asyncio.shield(flight)
+
+        flight = self._flights[airport.ident] = asyncio.ensure_future(self._fetch(airport))
+        try:
+            return await asyncio.shield(flight)
+        except Exception:
+            self.service.count("upstream_errors")
+            raise
+        finally:
+            if flight.done():
+                self._flights.pop(airport.ident, None)
+            else:
+                # === Caller went away, the fetch still finishes for the others ===
+                flight.add_done_callback(lambda _: self._flights.pop(airport.ident, None))
+
+    async def close(self):
+        if hasattr(self.service.provider, "aclose"):
+            await self.service.provider.aclose()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+async def send_json(send, data, status=200, headers=()):
+    body = json.dumps(data).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*"),
+            (b"x-content-type-options", b"nosniff"),
+            (b"x-frame-options", b"DENY"),
+            *headers,
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+flask_app = create_app()
+wsgi_app = WSGIMiddleware(flask_app, workers=ASGI_THREADS)
+airport_manager = AirportManager()
+async_weather = AsyncWeatherService()
+
+
+# -----------------------------
+# Weather API - GET /api/weather/<icao>
+# -----------------------------
+async def weather_response(icao):
+    airport = airport_manager.find_airport(icao)
+    if not airport:
+        return {"error": "Airport not found"}, 404
+    try:
+        return await async_weather.for_airport(airport), 200
+    except WeatherError as e:
+        return {"error": "Failed to fetch weather"}, e.status_code
+    except (httpx.HTTPError, requests.exceptions.RequestException):
+        return {"error": "Search failed"}, 500
+
+
+# === Same request metrics and Server-Timing as the Flask routes, under Flask's endpoint name ===
+async def get_weather(icao, send):
+    stats = instrumentation.start_request()
+    data, status = await weather_response(icao)
+    seconds = instrumentation.finish_request(stats, "GET", "get_weather", status)
+    headers = []
+    if instrumentation.SERVER_TIMING:
+        headers.append((b"server-timing", stats.server_timing(seconds).encode()))
+    await send_json(send, data, status, headers)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_weather.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] == "http" and scope["method"] == "GET":
+        match = WEATHER_PATH.fullmatch(scope["path"])
+        if match:
+            return await get_weather(match.group(1), send)
+    await wsgi_app(scope, receive, send)
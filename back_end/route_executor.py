@@ -0,0 +1,119 @@
+# === Multi-stop route searches in a process pool, with a deadline per search ===
+# ROUTE_WORKERS=0 (default) searches on the request thread. With ROUTE_WORKERS=N the heavy searches
+# run in N worker processes, so several players' long-haul searches use several cores.
+# Workers memory-map the distance matrix .npy the API process already wrote, the OS shares
+# those pages between processes and nothing but a few indexes is sent per search.
+# At the deadline a search returns the best route found so far (complete=False).
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import time
+import numpy as np
+from route_solver import search_route
+
+# ===  Constants ====
+ROUTE_WORKERS = int(os.getenv('ROUTE_WORKERS', 0))
+ROUTE_DEADLINE = float(os.getenv('ROUTE_DEADLINE', 2.0))
+# === Searches with fewer stops finish faster than a round trip to a worker ===
+ROUTE_POOL_MIN_STOPS = int(os.getenv('ROUTE_POOL_MIN_STOPS', 3))
+# === Extra wait for a worker past the deadline (result pickling, a busy pool) before giving up ===
+DEADLINE_GRACE = 0.5
+
+# === Worker process state: the memory-mapped distance matrix ===
+_worker_matrix = None
+
+
+def _init_worker(path):
+    global _worker_matrix
+    _worker_matrix = np.load(path, mmap_mode='r')
+
+
+# === deadline is time.monotonic(), the same clock in every process on the machine ===
+def _search_in_worker(start, end, candidates, num_stops, deadline):
+    return search_route(_worker_matrix, start, end, candidates, num_stops, deadline)
+
+
+class RouteExecutor:
+    def __init__(self, workers=ROUTE_WORKERS, deadline=ROUTE_DEADLINE, min_stops=ROUTE_POOL_MIN_STOPS):
+        self.workers = workers
+        self.deadline = deadline
+        self.min_stops = min_stops
+        self._pool = None
+        self._pool_path = None
+        self._lock = threading.Lock()
+        self.stats = {"inline": 0, "pooled": 0, "timed_out": 0, "cancelled": 0, "pool_restarts": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    # === One pool per distance matrix file, a new catalog gets fresh workers ===
+    def _get_pool(self, path):
+        with self._lock:
+            if self._pool is None or self._pool_path != path:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self.stats["pool_restarts"] += 1
+                # --- spawn: forking a threaded server process is unsafe ---
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(path,),
+                )
+                self._pool_path = path
+            return self._pool
+
+    # === (route positions, distance, complete) for start -> num_stops candidates -> end ===
+    # timeout is in seconds, None = ROUTE_DEADLINE, 0 = no deadline.
+    def search(self, distances, start, end, candidates, num_stops, timeout=None):
+        timeout = self.deadline if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout else None
+
+        use_pool = self.workers > 0 and distances.path is not None and num_stops >= self.min_stops
+        if not use_pool:
+            self._count("inline")
+            return self._finish(search_route(distances.matrix, start, end, candidates, num_stops, deadline))
+
+        self._count("pooled")
+        try:
+            future = self._get_pool(distances.path).submit(
+                _search_in_worker, start, end, list(candidates), num_stops, deadline)
+        except RuntimeError:
+            # --- Pool shut down or broken, answer on this thread ---
+            with self._lock:
+                self._pool = None
+            return self._finish(search_route(distances.matrix, start, end, candidates, num_stops, deadline))
+
+        try:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic()) + DEADLINE_GRACE
+            return self._finish(future.result(timeout=wait))
+        except concurrent.futures.TimeoutError:
+            # --- Still queued behind other searches: drop it and take the greedy route here ---
+            if future.cancel():
+                self._count("cancelled")
+            return self._finish(search_route(distances.matrix, start, end, candidates, num_stops, time.monotonic()))
+        except concurrent.futures.process.BrokenProcessPool:
+            with self._lock:
+                self._pool = None
+            return self._finish(search_route(distances.matrix, start, end, candidates, num_stops, deadline))
+
+    def _finish(self, result):
+        if not result[2]:
+            self._count("timed_out")
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+        return dict(data, workers=self.workers, deadline=self.deadline)
+
+
+route_executor = RouteExecutor()
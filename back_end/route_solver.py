@@ -0,0 +1,164 @@
+import time
+import numpy as np
+
+# === Search nodes expanded between two looks at the clock ===
+DEADLINE_CHECK_EVERY = 256
+# === solve_routes_batch works on destinations x candidates x candidates float64 arrays, at most this many cells ===
+BATCH_MAX_CELLS = 2_000_000
+
+
+# === Lower bounds: h[r][v] = shortest way from candidate v to end with exactly r more stops ===
+# Stops may repeat here, so every h is a lower bound for the real (distinct stops) route.
+def cost_to_go(sub, to_end, num_stops):
+    h = [to_end]
+    for _ in range(num_stops - 1):
+        h.append((sub + h[-1][None, :]).min(axis=1))
+    return h
+
+
+# === Best route start -> num_stops distinct candidates -> end (branch and bound) ===
+# deadline is a time.monotonic() value: the search stops there and returns the best route found so far.
+# Returns (route positions, distance, complete) or (None, None, True); complete=False if the deadline hit.
+def search_route(matrix, start, end, candidates, num_stops, deadline=None):
+    if num_stops == 0:
+        return [start, end], float(matrix[start, end]), True
+
+    nodes = np.asarray([c for c in candidates if c != start and c != end], dtype=np.intp)
+    if len(nodes) < num_stops:
+        return None, None, True
+
+    sub = np.array(matrix[np.ix_(nodes, nodes)], dtype=np.float64)
+    np.fill_diagonal(sub, np.inf)
+    from_start = np.array(matrix[start, nodes], dtype=np.float64)
+    to_end = np.array(matrix[nodes, end], dtype=np.float64)
+    h = cost_to_go(sub, to_end, num_stops)
+
+    # === The first descent follows the cheapest bounds (a greedy route), later ones only improve on it ===
+    best = {"distance": np.inf, "path": None, "expanded": 0, "timed_out": False}
+    path = []
+    used = np.zeros(len(nodes), dtype=bool)
+
+    def visit(row, cost, remaining):
+        if remaining == 0:
+            total = cost + to_end[path[-1]]
+            if total < best["distance"]:
+                best["distance"] = total
+                best["path"] = list(path)
+            return
+
+        best["expanded"] += 1
+        # --- Only once a route exists, so there is always one to return ---
+        if (deadline is not None and best["path"] is not None
+                and best["expanded"] % DEADLINE_CHECK_EVERY == 0 and time.monotonic() > deadline):
+            best["timed_out"] = True
+        if best["timed_out"]:
+            return
+
+        bounds = cost + row + h[remaining - 1]
+        for v in np.argsort(bounds, kind="stable"):
+            if bounds[v] >= best["distance"] or best["timed_out"]:
+                break
+            if used[v]:
+                continue
+            used[v] = True
+            path.append(v)
+            visit(sub[v], cost + row[v], remaining - 1)
+            path.pop()
+            used[v] = False
+
+    visit(from_start, 0.0, num_stops)
+
+    if best["path"] is None:
+        return None, None, True
+    route = [start] + [int(nodes[v]) for v in best["path"]] + [end]
+    return route, float(best["distance"]), not best["timed_out"]
+
+
+# === Optimal route start -> num_stops distinct candidates -> end: (route positions, distance) ===
+def solve_route(matrix, start, end, candidates, num_stops):
+    route, distance, _ = search_route(matrix, start, end, candidates, num_stops)
+    return route, distance
+
+
+# === Optimal routes for several destinations and every stop count 0..max_stops ===
+# candidate_lists[d] are the allowed stops for ends[d]. deadline is a time.monotonic() value as in search_route.
+# Returns routes[d][k] = (route, distance, complete) or (None, None, True).
+def solve_routes_batch(matrix, start, ends, candidate_lists, max_stops, deadline=None):
+    lists = [[c for c in candidates if c != start and c != end] for candidates, end in zip(candidate_lists, ends)]
+    routes = []
+    for chunk in batch_chunks(lists):
+        if deadline is not None and time.monotonic() > deadline:
+            # --- Out of time: the greedy first route for each remaining destination ---
+            for d in chunk:
+                routes.append([([start, ends[d]], float(matrix[start, ends[d]]), True)] + [
+                    search_route(matrix, start, ends[d], lists[d], r, deadline) for r in range(1, max_stops + 1)
+                ])
+            continue
+        routes += solve_chunk(matrix, start, [ends[d] for d in chunk], [lists[d] for d in chunk], max_stops, deadline)
+    return routes
+
+
+# === Destinations grouped so that chunk size x union of candidates^2 stays within BATCH_MAX_CELLS ===
+# A destination whose own candidates exceed it gets a chunk of its own, the size search_route works with.
+def batch_chunks(lists):
+    chunk, union = [], set()
+    for d, candidates in enumerate(lists):
+        merged = union.union(candidates)
+        if chunk and (len(chunk) + 1) * len(merged) ** 2 > BATCH_MAX_CELLS:
+            yield chunk
+            chunk, merged = [], set(candidates)
+        chunk.append(d)
+        union = merged
+    if chunk:
+        yield chunk
+
+
+# === One pass over every stop count for a chunk of destinations (lists exclude start and end) ===
+def solve_chunk(matrix, start, ends, lists, max_stops, deadline):
+    routes = [[(None, None, True)] * (max_stops + 1) for _ in ends]
+    for d, end in enumerate(ends):
+        routes[d][0] = ([start, end], float(matrix[start, end]), True)
+    if max_stops == 0 or not ends:
+        return routes
+
+    # === Union of candidates, with a per-destination mask over it ===
+    nodes = np.unique(np.concatenate([np.asarray(c, dtype=np.intp) for c in lists] + [np.empty(0, dtype=np.intp)]))
+    if len(nodes) == 0:
+        return routes
+    local = {int(node): i for i, node in enumerate(nodes)}
+    allowed = np.zeros((len(ends), len(nodes)), dtype=bool)
+    for d, candidates in enumerate(lists):
+        allowed[d, [local[c] for c in candidates]] = True
+
+    sub = np.array(matrix[np.ix_(nodes, nodes)], dtype=np.float64)
+    np.fill_diagonal(sub, np.inf)
+    to_end = np.array(matrix[np.ix_(nodes, np.asarray(ends, dtype=np.intp))], dtype=np.float64).T
+
+    # === cost[d, v] = shortest start -> ... -> v with exactly r stops (repeats allowed) ===
+    cost = np.where(allowed, np.array(matrix[start, nodes], dtype=np.float64)[None, :], np.inf)
+    parents = []
+    for r in range(1, max_stops + 1):
+        if r > 1:
+            through = cost[:, :, None] + sub[None, :, :]
+            parents.append(through.argmin(axis=1))
+            cost = np.where(allowed, through.min(axis=1), np.inf)
+            del through
+
+        total = cost + to_end
+        for d, end in enumerate(ends):
+            if allowed[d].sum() < r:
+                continue
+            v = int(total[d].argmin())
+            if not np.isfinite(total[d, v]):
+                continue
+            path = [v]
+            for parent in reversed(parents):
+                path.append(int(parent[d, path[-1]]))
+            path.reverse()
+
+            if len(set(path)) == len(path):
+                routes[d][r] = ([start] + [int(nodes[i]) for i in path] + [end], float(total[d, v]), True)
+            else:
+                # === Relaxed optimum revisits a stop, solve this one exactly ===
+                routes[d][r] = search_route(matrix, start, end, lists[d], r, deadline)
+    return routes
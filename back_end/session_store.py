@@ -0,0 +1,267 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ===  Constants ====
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
+SESSION_TTL = int(os.getenv('SESSION_TTL', 2 * 60 * 60))
+SESSION_MAX = int(os.getenv('SESSION_MAX', 10000))
+SESSION_SQLITE_PATH = os.getenv('SESSION_SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sessions.db'))
+SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+# === Redis keeps expired games this much longer so the reaper can still save their results ===
+SESSION_REDIS_GRACE = int(os.getenv('SESSION_REDIS_GRACE', 60 * 60))
+
+# === Atomically take a game out of Redis if its expiry time is <= ARGV[2] (a time or +inf), returns its state ===
+REDIS_CLAIM_SCRIPT = """
+local expires_at = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not expires_at or (ARGV[2] ~= '+inf' and tonumber(expires_at) > tonumber(ARGV[2])) then
+    return false
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+local data = redis.call('GET', KEYS[2])
+redis.call('DEL', KEYS[2])
+return data
+"""
+
+
+# === Game state is stored as JSON: {"session": {...}, "total": {...}} ===
+def encode_state(state):
+    return json.dumps(state, separators=(",", ":"))
+
+
+def decode_state(data):
+    return json.loads(data) if data else None
+
+
+# === Eviction hook: on_evict(player_name, state, reason) with reason "idle" or "lru" ===
+class EvictionHook:
+    on_evict = None
+
+    def _evicted(self, evicted, reason):
+        if self.on_evict is None:
+            return
+        for player_name, data in evicted:
+            self.on_evict(player_name, decode_state(data), reason)
+
+
+# === In-process store with idle TTL and LRU cap ===
+class MemorySessionStore(EvictionHook):
+    def __init__(self, ttl=SESSION_TTL, max_entries=SESSION_MAX):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, player_name):
+        return self.get(player_name) is not None
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, player_name):
+        expired = []
+        with self._lock:
+            entry = self._data.get(player_name)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if time.time() > expires_at:
+                del self._data[player_name]
+                expired.append((player_name, data))
+            else:
+                self._data.move_to_end(player_name)
+        if expired:
+            self._evicted(expired, "idle")
+            return None
+        return decode_state(data)
+
+    def set(self, player_name, state, ttl=None):
+        data = encode_state(state)
+        evicted = []
+        with self._lock:
+            self._data[player_name] = (data, time.time() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(player_name)
+            while len(self._data) > self.max_entries:
+                name, (old_data, _) = self._data.popitem(last=False)
+                evicted.append((name, old_data))
+        self._evicted(evicted, "lru")
+
+    def delete(self, player_name):
+        with self._lock:
+            self._data.pop(player_name, None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [(name, data) for name, (data, expires_at) in self._data.items() if expires_at < now]
+            for name, _ in expired:
+                del self._data[name]
+        self._evicted(expired, "idle")
+        return len(expired)
+
+
+# === SQLite file store, shared by all worker processes on one host ===
+class SQLiteSessionStore(EvictionHook):
+    def __init__(self, path=SESSION_SQLITE_PATH, ttl=SESSION_TTL, max_entries=SESSION_MAX):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        with self._connect() as yhteys:
+            yhteys.execute("PRAGMA journal_mode=WAL")
+            yhteys.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    player_name TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            yhteys.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+            yhteys.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    @contextmanager
+    def _connect(self):
+        yhteys = sqlite3.connect(self.path, timeout=10)
+        try:
+            with yhteys:
+                yield yhteys
+        finally:
+            yhteys.close()
+
+    def __contains__(self, player_name):
+        return self.get(player_name) is not None
+
+    def __len__(self):
+        with self._connect() as yhteys:
+            return yhteys.execute("SELECT COUNT(*) FROM sessions WHERE expires_at >= ?", (time.time(),)).fetchone()[0]
+
+    def get(self, player_name):
+        with self._connect() as yhteys:
+            row = yhteys.execute(
+                "SELECT state FROM sessions WHERE player_name = ? AND expires_at >= ?",
+                (player_name, time.time())
+            ).fetchone()
+        return decode_state(row[0]) if row else None
+
+    def set(self, player_name, state, ttl=None):
+        now = time.time()
+        with self._connect() as yhteys:
+            yhteys.execute(
+                "INSERT OR REPLACE INTO sessions (player_name, state, updated_at, expires_at) VALUES (?, ?, ?, ?)",
+                (player_name, encode_state(state), now, now + (self.ttl if ttl is None else ttl))
+            )
+            overflow = yhteys.execute(
+                "SELECT player_name, state FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                (self.max_entries,)
+            ).fetchall()
+            yhteys.executemany("DELETE FROM sessions WHERE player_name = ?", [(name,) for name, _ in overflow])
+        self._evicted(overflow, "lru")
+
+    def delete(self, player_name):
+        with self._connect() as yhteys:
+            yhteys.execute("DELETE FROM sessions WHERE player_name = ?", (player_name,))
+
+    # === Write lock before the SELECT: only one worker's reaper sees each expired game ===
+    # and set() cannot refresh a row between the SELECT and the DELETE.
+    def purge_expired(self):
+        now = time.time()
+        with self._connect() as yhteys:
+            yhteys.execute("BEGIN IMMEDIATE")
+            expired = yhteys.execute(
+                "SELECT player_name, state FROM sessions WHERE expires_at < ?", (now,)
+            ).fetchall()
+            yhteys.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+        self._evicted(expired, "idle")
+        return len(expired)
+
+
+# === Redis (or compatible) store, shared across hosts ===
+# A sorted set holds every game's expiry time. Keys outlive it by SESSION_REDIS_GRACE, so
+# purge_expired() still finds the state to save. Games are claimed by a Lua script, so with
+# several workers each eviction is reported once. Run Redis with maxmemory-policy noeviction:
+# keys the server drops on its own never reach the eviction hook.
+class RedisSessionStore(EvictionHook):
+    def __init__(self, url=SESSION_REDIS_URL, ttl=SESSION_TTL, max_entries=SESSION_MAX, grace=SESSION_REDIS_GRACE,
+                 prefix="lentopeli:session:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("SESSION_BACKEND=redis needs the 'redis' package (pip install redis)") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.grace = grace
+        self.prefix = prefix
+        self.expiry_key = prefix.rstrip(":") + "-expiry"
+        self._claim_script = self.client.register_script(REDIS_CLAIM_SCRIPT)
+
+    def _claim(self, player_name, max_expires_at):
+        return self._claim_script(keys=[self.expiry_key, self.prefix + player_name],
+                                  args=[player_name, max_expires_at])
+
+    def __contains__(self, player_name):
+        return self.get(player_name) is not None
+
+    def __len__(self):
+        return self.client.zcount(self.expiry_key, time.time(), "+inf")
+
+    def get(self, player_name):
+        pipe = self.client.pipeline()
+        pipe.get(self.prefix + player_name)
+        pipe.zscore(self.expiry_key, player_name)
+        data, expires_at = pipe.execute()
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return decode_state(data)
+
+    # === Over max_entries, the games closest to expiring (least recently used) are evicted ===
+    def set(self, player_name, state, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + player_name, encode_state(state), ex=max(1, int(ttl + self.grace)))
+        pipe.zadd(self.expiry_key, {player_name: time.time() + ttl})
+        pipe.zcard(self.expiry_key)
+        count = pipe.execute()[-1]
+
+        evicted = []
+        if count > self.max_entries:
+            for name in self.client.zrange(self.expiry_key, 0, count - self.max_entries - 1):
+                name = name.decode()
+                data = self._claim(name, "+inf")
+                if data is not None:
+                    evicted.append((name, data))
+        self._evicted(evicted, "lru")
+
+    def delete(self, player_name):
+        pipe = self.client.pipeline()
+        pipe.delete(self.prefix + player_name)
+        pipe.zrem(self.expiry_key, player_name)
+        pipe.execute()
+
+    def purge_expired(self):
+        now = time.time()
+        expired = []
+        for name in self.client.zrangebyscore(self.expiry_key, "-inf", now):
+            name = name.decode()
+            data = self._claim(name, now)
+            if data is not None:
+                expired.append((name, data))
+        self._evicted(expired, "idle")
+        return len(expired)
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    if backend == 'memory':
+        return MemorySessionStore()
+    if backend == 'sqlite':
+        return SQLiteSessionStore()
+    if backend == 'redis':
+        return RedisSessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND '{backend}', use memory, sqlite or redis")
@@ -0,0 +1,64 @@
+import numpy as np
+from distances import EARTH_RADIUS_KM, distance_function
+
+# === Grid cell size in degrees ===
+CELL_DEG = 5.0
+
+# === Slack for ellipsoid vs sphere differences in the cell bounds ===
+BOUND_SLACK = 1.01
+
+
+# === Lat/lng bucket grid over airport coordinates, queried with distance bounds per cell ===
+class SpatialGrid:
+    def __init__(self, lats, lngs, cell_deg=CELL_DEG, mode=None):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self.function = distance_function(mode)
+
+        rows = np.floor((self.lats + 90) / cell_deg).astype(int)
+        cols = np.floor((self.lngs + 180) / cell_deg).astype(int)
+        buckets = {}
+        for position, cell in enumerate(zip(rows.tolist(), cols.tolist())):
+            buckets.setdefault(cell, []).append(position)
+
+        self.cells = [np.asarray(positions, dtype=np.intp) for positions in buckets.values()]
+        keys = np.asarray(list(buckets.keys()), dtype=np.float64).reshape(-1, 2)
+        lat_low = keys[:, 0] * cell_deg - 90
+        lng_low = keys[:, 1] * cell_deg - 180
+        self.center_lats = lat_low + cell_deg / 2
+        self.center_lngs = lng_low + cell_deg / 2
+
+        # === Every point of a cell is within this many km of its center ===
+        min_abs_lat = np.minimum(np.abs(lat_low), np.abs(lat_low + cell_deg))
+        min_abs_lat = np.where(lat_low * (lat_low + cell_deg) < 0, 0.0, min_abs_lat)
+        half_span = np.radians(cell_deg / 2) * EARTH_RADIUS_KM
+        self.radii = (half_span + half_span * np.cos(np.radians(min_abs_lat))) * BOUND_SLACK + 1.0
+
+    def _distances_from(self, lat, lng, positions):
+        return self.function(lat, lng, self.lats[positions], self.lngs[positions])
+
+    def _collect(self, cell_mask):
+        if not cell_mask.any():
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([self.cells[i] for i in np.flatnonzero(cell_mask)])
+
+    # === Positions within radius_km of a point ===
+    def within_radius(self, lat, lng, radius_km):
+        to_center = self.function(lat, lng, self.center_lats, self.center_lngs)
+        positions = self._collect(to_center - self.radii <= radius_km)
+        if len(positions) == 0:
+            return positions
+        return np.sort(positions[self._distances_from(lat, lng, positions) <= radius_km])
+
+    # === Positions p with d(start, p) + d(p, end) <= d(start, end) + max_detour_km ===
+    def within_detour(self, start_lat, start_lng, end_lat, end_lng, max_detour_km):
+        limit = float(self.function(start_lat, start_lng, end_lat, end_lng)) + max_detour_km
+        via_center = (self.function(start_lat, start_lng, self.center_lats, self.center_lngs)
+                      + self.function(self.center_lats, self.center_lngs, end_lat, end_lng))
+        positions = self._collect(via_center - 2 * self.radii <= limit)
+        if len(positions) == 0:
+            return positions
+        via = (self._distances_from(start_lat, start_lng, positions)
+               + self.function(self.lats[positions], self.lngs[positions], end_lat, end_lng))
+        return np.sort(positions[via <= limit])
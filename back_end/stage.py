@@ -1,34 +1,28 @@
 import random
-from itertools import permutations
-from db import get_connection
+from instrumentation import timed
+from stage_planner import stage_planner
 from tips_countries import tips_countries
 
 class Stage:
-    def __init__(self, level):
+    # === seed makes the chosen countries and airports reproducible ===
+    def __init__(self, level, seed=None, num_countries=3):
         self.level = level
-        self.yhteys = get_connection()
+        self.rng = random.Random(seed)
+        self.num_countries = min(num_countries, len(tips_countries))
 
     # === Define stage and randomly choose countries with one airport each ===
+    @timed("task_criteria")
     def task_criteria(self, session_state, airport_manager):
         session_state['current_stage'] += 1
 
-        selected_countries = random.sample(list(tips_countries.keys()), 3)
+        selected_countries = self.rng.sample(list(tips_countries.keys()), self.num_countries)
 
+        # === Pick one airport per country from the in-memory catalog ===
         places = {}
-        cursor = self.yhteys.cursor()
-        for country_code  in selected_countries:
-            sql = """
-                SELECT airport.ident 
-                FROM airport
-                WHERE airport.iso_country = %s AND airport.type = 'large_airport'
-                ORDER BY RAND()
-                LIMIT 1;
-            """
-            cursor.execute(sql, (country_code,))
-            result = cursor.fetchone()
-            if result:
-                icao = result[0]
-                places[country_code] = icao
+        for country_code in selected_countries:
+            airports = airport_manager.get_airports_by_country(country_code)
+            if airports:
+                places[country_code] = self.rng.choice(airports).ident
             else:
                 print(f"⚠️ No large airport found for {country_code}. Skipping.")
         session_state['places'] = places
@@ -43,7 +37,8 @@ class Stage:
     def calc_co2_emmission(self, distance_km):
         return distance_km * 0.15
 
-    # === Find best order between the 3 countries set as the level mission ===
+    # === Find best order between the countries set as the level mission ===
+    @timed("get_shortest_route")
     def get_shortest_route(self, session_state, airport_manager, margin=1.2):
         places = session_state.get('places', {})
         if not places or len(places) < 2:
@@ -64,25 +59,20 @@ class Stage:
                 print(f"⚠️ Airport {icao} for {country} not found.")
                 return None
 
-        best_route = None
-        best_distance = 10000000000
-        best_order_countries = None
-
-        # === Test all permutations of destinations to find minimal total distance ===
-        for perm in permutations(dest_airports):
-            route = [start_airport] + [airport for _, airport in perm]
-            dist = airport_manager.total_route_distance(route)
-            if dist < best_distance:
-                best_distance = dist
-                best_route = route
-                best_order_countries = [country for country, _ in perm]
-
-        total_co2 = self.calc_co2_emmission(best_distance)
+        # === Held-Karp over the destinations, cached across stages and players ===
+        plan = stage_planner.plan(
+            airport_manager,
+            start_airport,
+            [airport for _, airport in dest_airports],
+            margin,
+            self.calc_co2_emmission
+        )
+        country_by_icao = {airport.ident: country for country, airport in dest_airports}
 
         return {
-            'route': best_route,
-            'order_countries': best_order_countries,
-            'total_distance': best_distance,
-            'total_co2': total_co2,
-            'co2_with_margin': total_co2 * margin
+            'route': [start_airport] + list(plan['route']),
+            'order_countries': [country_by_icao[airport.ident] for airport in plan['route']],
+            'total_distance': plan['total_distance'],
+            'total_co2': plan['total_co2'],
+            'co2_with_margin': plan['co2_with_margin']
         }
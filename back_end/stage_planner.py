@@ -0,0 +1,77 @@
+import os
+import numpy as np
+from cache import LRUCache
+
+STAGE_PLAN_CACHE_SIZE = int(os.getenv('STAGE_PLAN_CACHE_SIZE', 1024))
+
+
+# === Held-Karp: shortest open path from start through every target once ===
+def held_karp(matrix, start, targets):
+    n = len(targets)
+    if n == 0:
+        return [], 0.0
+
+    targets = np.asarray(targets, dtype=np.intp)
+    d = np.array(matrix[np.ix_(targets, targets)], dtype=np.float64)
+    from_start = np.array(matrix[start, targets], dtype=np.float64)
+
+    # === cost[mask, j] = shortest path from start visiting mask, ending at target j ===
+    cost = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.intp)
+    for j in range(n):
+        cost[1 << j, j] = from_start[j]
+
+    for mask in range(1, 1 << n):
+        for j in range(n):
+            bit = 1 << j
+            if not mask & bit or mask == bit:
+                continue
+            through = cost[mask ^ bit] + d[:, j]
+            i = int(np.argmin(through))
+            cost[mask, j] = through[i]
+            parent[mask, j] = i
+
+    mask = (1 << n) - 1
+    j = int(np.argmin(cost[mask]))
+    distance = float(cost[mask, j])
+    order = []
+    while j != -1:
+        order.append(j)
+        mask, j = mask ^ (1 << j), int(parent[mask, j])
+    order.reverse()
+    return [int(targets[j]) for j in order], distance
+
+
+# === Best visiting order for a stage, cached by (origin, destinations, margin) ===
+class StagePlanner:
+    def __init__(self, maxsize=STAGE_PLAN_CACHE_SIZE):
+        self.cache = LRUCache(maxsize)
+
+    def plan(self, airport_manager, start_airport, dest_airports, margin, co2_function):
+        catalog = airport_manager.catalog
+        key = (
+            catalog.version,
+            start_airport.ident,
+            frozenset(airport.ident for airport in dest_airports),
+            margin,
+        )
+
+        def compute():
+            positions = catalog.positions
+            order, distance = held_karp(
+                catalog.distances.matrix,
+                positions[start_airport.ident],
+                [positions[airport.ident] for airport in dest_airports]
+            )
+            total_co2 = co2_function(distance)
+            return {
+                'route': tuple(catalog.airports[p] for p in order),
+                'total_distance': distance,
+                'total_co2': total_co2,
+                'co2_with_margin': total_co2 * margin
+            }
+
+        return self.cache.get_or_compute(key, compute)
+
+
+stage_planner = StagePlanner()
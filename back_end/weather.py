@@ -0,0 +1,261 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from cache import TTLCache
+from instrumentation import timed
+
+load_dotenv()
+
+# ===  Constants ====
+OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
+OPENWEATHER_URL = os.getenv('OPENWEATHER_URL', 'https://api.openweathermap.org/data/2.5/weather')
+WEATHER_CONNECT_TIMEOUT = float(os.getenv('WEATHER_CONNECT_TIMEOUT', 2))
+WEATHER_READ_TIMEOUT = float(os.getenv('WEATHER_READ_TIMEOUT', 4))
+WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', 10 * 60))
+WEATHER_CACHE_SIZE = int(os.getenv('WEATHER_CACHE_SIZE', 4096))
+WEATHER_POOL_SIZE = int(os.getenv('WEATHER_POOL_SIZE', 10))
+# === Upstream rate limit (OpenWeather free plan: 60 calls/min) ===
+WEATHER_RATE = float(os.getenv('WEATHER_RATE', 1))
+WEATHER_BURST = int(os.getenv('WEATHER_BURST', 10))
+WEATHER_RATE_WAIT = float(os.getenv('WEATHER_RATE_WAIT', 5))
+WEATHER_PREFETCH_WORKERS = int(os.getenv('WEATHER_PREFETCH_WORKERS', 4))
+# === Tokens background prefetch leaves in the bucket for interactive requests ===
+WEATHER_PREFETCH_RESERVE = int(os.getenv('WEATHER_PREFETCH_RESERVE', 2))
+
+
+# === Upstream answered with an error status ===
+class WeatherError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"Weather provider returned {status_code}")
+        self.status_code = status_code
+
+
+# === OpenWeather response -> fields returned by /api/weather ===
+def parse_openweather(json_result):
+    return {
+        "weather": json_result["weather"][0]["main"],
+        "wind": json_result["wind"]["speed"],
+        "description": json_result["weather"][0]["description"],
+        "temperature": round(json_result["main"]["temp"] - 273.15),
+        "icon": f"http://openweathermap.org/img/wn/{json_result['weather'][0]['icon']}@2x.png"
+    }
+
+
+# === OpenWeather current weather, base_url can point to a local stub server ===
+# fetch is used by the Flask routes, fetch_async by the ASGI weather route (needs httpx).
+class OpenWeatherProvider:
+    def __init__(self, api_key=OPENWEATHER_API_KEY, base_url=OPENWEATHER_URL,
+                 timeout=(WEATHER_CONNECT_TIMEOUT, WEATHER_READ_TIMEOUT), pool_size=WEATHER_POOL_SIZE):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.async_client = None
+
+    def _params(self, lat, lng):
+        return {"lat": lat, "lon": lng, "appid": self.api_key}
+
+    # === Errors and malformed payloads both raise WeatherError, 502 for a body that does not parse ===
+    def _weather(self, status_code, read_json):
+        if status_code != 200:
+            raise WeatherError(status_code)
+        try:
+            return parse_openweather(read_json())
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise WeatherError(502) from e
+
+    def fetch(self, lat, lng):
+        result = self.session.get(self.base_url, params=self._params(lat, lng), timeout=self.timeout)
+        return self._weather(result.status_code, result.json)
+
+    async def fetch_async(self, lat, lng):
+        if self.async_client is None:
+            try:
+                import httpx
+            except ImportError as e:
+                raise RuntimeError("Async weather needs the 'httpx' package (pip install httpx)") from e
+            connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+            self.async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+        result = await self.async_client.get(self.base_url, params=self._params(lat, lng))
+        return self._weather(result.status_code, result.json)
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+
+
+# === Token bucket: rate calls per second on average, bursts up to burst calls ===
+class RateLimiter:
+    def __init__(self, rate=WEATHER_RATE, burst=WEATHER_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # === Take a token if more than keep are left: 0, otherwise seconds until there are ===
+    def _take(self, keep=0):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1 + keep:
+                self._tokens -= 1
+                return 0
+            return (1 + keep - self._tokens) / self.rate
+
+    # === Take a token without waiting, only if keep tokens stay in the bucket afterwards ===
+    def try_acquire(self, keep=0):
+        return not self._take(keep)
+
+    # === Take one token, waiting at most timeout seconds; False if none became available ===
+    def acquire(self, timeout=WEATHER_RATE_WAIT):
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    # === Same as acquire for coroutines, waits without blocking the event loop ===
+    async def acquire_async(self, timeout=WEATHER_RATE_WAIT):
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+# === One upstream call in progress, other callers wait for its result ===
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# === Weather per airport with TTL cache and single-flight upstream calls ===
+class WeatherService:
+    def __init__(self, provider=None, ttl=WEATHER_CACHE_TTL, maxsize=WEATHER_CACHE_SIZE,
+                 limiter=None, workers=WEATHER_PREFETCH_WORKERS):
+        self.provider = provider if provider is not None else OpenWeatherProvider()
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.workers = workers
+        self._executor = None
+        self.cache = TTLCache(ttl, maxsize)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {"upstream_calls": 0, "upstream_errors": 0, "coalesced": 0, "rate_limited": 0, "prefetched": 0,
+                      "prefetch_skipped": 0}
+
+    # === Add one to a counter in stats, also used by the ASGI weather route ===
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    # prefetch=True never waits for the rate limiter and leaves WEATHER_PREFETCH_RESERVE tokens for requests.
+    @timed("get_weather")
+    def get(self, key, lat, lng, prefetch=False):
+        weather = self.cache.get(key)
+        if weather is not None:
+            return weather
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        skipped = False
+        try:
+            if prefetch and not self.limiter.try_acquire(WEATHER_PREFETCH_RESERVE):
+                self.count("prefetch_skipped")
+                skipped = True
+                raise WeatherError(429)
+            if not prefetch and not self.limiter.acquire():
+                self.count("rate_limited")
+                raise WeatherError(429)
+            self.count("upstream_calls")
+            flight.result = self.provider.fetch(lat, lng)
+            self.cache.set(key, flight.result)
+            return flight.result
+        except Exception as e:
+            # === Errors are not cached, the next request tries again ===
+            if not skipped:
+                self.count("upstream_errors")
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def for_airport(self, airport):
+        return self.get(airport.ident, airport.lat, airport.lng)
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="weather")
+        return self._executor
+
+    def _fetch_quietly(self, airport):
+        try:
+            return self.for_airport(airport)
+        except (WeatherError, requests.exceptions.RequestException) as e:
+            return e
+
+    # === Weather for several airports fetched concurrently: {ident: weather or exception} ===
+    def for_airports(self, airports):
+        futures = {airport.ident: self._pool().submit(self._fetch_quietly, airport) for airport in airports}
+        return {ident: future.result() for ident, future in futures.items()}
+
+    def _prefetch(self, airport):
+        try:
+            self.get(airport.ident, airport.lat, airport.lng, prefetch=True)
+        except (WeatherError, requests.exceptions.RequestException):
+            pass
+
+    # === Warm the cache in the background, airports already cached are skipped ===
+    # Prefetch only uses spare rate limit tokens, without one the airport is left for the first request.
+    def prefetch(self, airports):
+        for airport in airports:
+            if self.cache.get(airport.ident) is None:
+                self.count("prefetched")
+                self._pool().submit(self._prefetch, airport)
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self.stats)
+        data["cache"] = self.cache.metrics()
+        return data
+
+
+weather_service = WeatherService()